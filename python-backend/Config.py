@@ -3,5 +3,148 @@ import os
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'stores.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    DATABASE_PATH = os.path.join(BASE_DIR, 'stores.db')
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + DATABASE_PATH
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Damage detection micro-batching: a batch is run as soon as it holds
+    # DAMAGE_BATCH_MAX_SIZE images or the first image has waited DAMAGE_BATCH_MAX_WAIT_MS
+    # (1 disables batching; serve.py sets it in inference pool workers)
+    DAMAGE_BATCH_MAX_SIZE = int(os.environ.get('DAMAGE_BATCH_MAX_SIZE', 8))
+    DAMAGE_BATCH_MAX_WAIT_MS = float(os.environ.get('DAMAGE_BATCH_MAX_WAIT_MS', 10))
+
+    # YOLOv8 repairability check: input size (a multiple of 32), confidence a
+    # box needs to count, boxes kept after NMS (one answers "any damage box?")
+    # and an optional comma-separated list of class ids to detect
+    YOLO_IMGSZ = int(os.environ.get('YOLO_IMGSZ', 640))
+    YOLO_CONF = float(os.environ.get('YOLO_CONF', 0.5))
+    YOLO_MAX_DET = int(os.environ.get('YOLO_MAX_DET', 1))
+    YOLO_CLASSES = [int(c) for c in os.environ.get('YOLO_CLASSES', '').split(',') if c.strip()]
+
+    # Uploaded images are decoded in memory; keeping the originals on disk is
+    # optional and happens off the request thread
+    UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
+    PERSIST_UPLOADS = os.environ.get('PERSIST_UPLOADS', '1') == '1'
+
+    # Reviews classified per model call by /predict/batch
+    SENTIMENT_BATCH_CHUNK_SIZE = int(os.environ.get('SENTIMENT_BATCH_CHUNK_SIZE', 512))
+
+    # Sentiment aggregation: recent reviews kept per process and how often
+    # counter deltas and store feedback are flushed to SQLite (seconds)
+    REVIEW_BUFFER_CAPACITY = int(os.environ.get('REVIEW_BUFFER_CAPACITY', 100))
+    REVIEW_FLUSH_INTERVAL = float(os.environ.get('REVIEW_FLUSH_INTERVAL', 5))
+
+    # SQLite connection pool (see data_access.py)
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+    SQLITE_STATEMENT_CACHE = 256
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+    # Background writer for the logs table (see log_sink.py). LOG_QUEUE_POLICY
+    # is one of 'block', 'drop_newest' or 'drop_oldest'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 200))
+    LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 1))
+    LOG_QUEUE_POLICY = os.environ.get('LOG_QUEUE_POLICY', 'drop_newest')
+
+    # Upper bound for the limit parameter of /stores/nearby
+    NEARBY_STORES_MAX_LIMIT = 100
+
+    # Upper bound for the limit parameter of /products/search
+    PRODUCT_SEARCH_MAX_LIMIT = 100
+
+    # Upper bound for the page size of /damage_reports
+    DAMAGE_REPORTS_MAX_LIMIT = 500
+
+    # Models load lazily on first use. With MODEL_WARMUP they are also loaded
+    # in a background thread at startup, optionally followed by one dummy
+    # inference each so the first real request skips graph tracing
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
+    MODEL_WARMUP_DUMMY_INFERENCE = os.environ.get('MODEL_WARMUP_DUMMY_INFERENCE', '1') == '1'
+
+    # TensorFlow thread pools (0 = TensorFlow default). Inter-op threads let
+    # independent models, e.g. the two tire models, execute at the same time
+    TF_INTER_OP_THREADS = int(os.environ.get('TF_INTER_OP_THREADS', 2))
+    TF_INTRA_OP_THREADS = int(os.environ.get('TF_INTRA_OP_THREADS', 0))
+
+    # How the Keras models are invoked (services/inference.py): 'function' (a
+    # cached tf.function with a fixed input signature), 'direct' (eager
+    # model(x, training=False)) or 'predict' (the Keras predict loop)
+    INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'function')
+
+    # ONNX Runtime backend (services/onnx_backend.py): comma-separated model
+    # names, e.g. "efficientnetv2_damage,yolov8_damage", served from
+    # models/onnx/<name>.onnx instead of the original files. ONNX_QUANTIZED
+    # loads the INT8 exports (<name>.int8.onnx) written by services/onnx_export.py.
+    # Optional: needs `pip install onnxruntime`, which is not in requirements.txt
+    ONNX_MODELS = [name.strip() for name in os.environ.get('ONNX_MODELS', '').split(',') if name.strip()]
+    ONNX_DIR = os.environ.get('ONNX_DIR', os.path.join(BASE_DIR, 'models', 'onnx'))
+    ONNX_QUANTIZED = os.environ.get('ONNX_QUANTIZED', '0') == '1'
+    ONNX_INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', 0))
+    ONNX_INTER_OP_THREADS = int(os.environ.get('ONNX_INTER_OP_THREADS', 0))
+
+    # Tire assessment: run ResNet50 and U-Net concurrently on a thread pool,
+    # or traced together into one tf.function graph when TIRE_FUSED_GRAPH is set
+    # (ignored when either tire model is served by ONNX Runtime)
+    TIRE_PARALLEL_WORKERS = int(os.environ.get('TIRE_PARALLEL_WORKERS', 4))
+    TIRE_FUSED_GRAPH = os.environ.get('TIRE_FUSED_GRAPH', '0') == '1'
+
+    # Largest tire set accepted by /tire_segmentation/upload/batch
+    TIRE_BATCH_MAX_IMAGES = int(os.environ.get('TIRE_BATCH_MAX_IMAGES', 8))
+
+    # Tread-depth post-processing: extra mask thresholds reported next to the
+    # standard 0.5 one, and the number of horizontal bands (rows) per mask
+    TIRE_DEPTH_THRESHOLDS = [float(t) for t in os.environ.get('TIRE_DEPTH_THRESHOLDS', '0.3,0.5,0.7').split(',')]
+    TIRE_TREAD_BANDS = int(os.environ.get('TIRE_TREAD_BANDS', 4))
+
+    # Inference result cache keyed by image hash (services/result_cache.py):
+    # an in-process LRU plus an optional SQLite tier shared across workers.
+    # Keys carry a fingerprint of the MODELS_DIR files the loaded models came from
+    MODELS_DIR = os.path.join(BASE_DIR, 'models')
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1024))
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 24 * 3600))
+    RESULT_CACHE_DISK = os.environ.get('RESULT_CACHE_DISK', '0') == '1'
+    RESULT_CACHE_DISK_PATH = os.environ.get('RESULT_CACHE_DISK_PATH', os.path.join(BASE_DIR, 'result_cache.db'))
+    RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_DISK_MAX_ENTRIES', 100000))
+
+    # Vehicle price prediction: memoized single predictions and the largest
+    # inventory accepted by /vehicle_classification/predict/batch
+    PRICE_MEMO_SIZE = int(os.environ.get('PRICE_MEMO_SIZE', 4096))
+    PRICE_BATCH_MAX_ITEMS = int(os.environ.get('PRICE_BATCH_MAX_ITEMS', 20000))
+
+    # How often (seconds) /vehicle_price_trends checks whether SQLite changed
+    # before reusing its in-memory copy of vehicle_market_analysis
+    MARKET_TRENDS_CHECK_INTERVAL = float(os.environ.get('MARKET_TRENDS_CHECK_INTERVAL', 2))
+
+    # Damage reports are persisted by a background writer (report_writer.py):
+    # queue capacity in reports and in upload bytes held in memory, and the
+    # longest side of list-view thumbnails (px)
+    REPORT_QUEUE_SIZE = int(os.environ.get('REPORT_QUEUE_SIZE', 1000))
+    REPORT_QUEUE_BYTES = int(os.environ.get('REPORT_QUEUE_BYTES', 256 * 1024 * 1024))
+    REPORT_THUMBNAIL_SIZE = int(os.environ.get('REPORT_THUMBNAIL_SIZE', 256))
+
+    # Asynchronous inference (?async=1 on the upload endpoints, see job_queue.py):
+    # worker threads per process, attempts per job, seconds before a 'running'
+    # job is considered orphaned, how long finished jobs are kept, and the
+    # longest /jobs/<id>?wait= long-poll (seconds)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 300))
+    JOB_RETENTION = float(os.environ.get('JOB_RETENTION', 24 * 3600))
+    JOB_LONG_POLL_MAX = float(os.environ.get('JOB_LONG_POLL_MAX', 30))
+
+    # Multi-process serving (serve.py): 'prefork' runs SERVE_WORKERS HTTP
+    # processes on one listening socket, 'dispatch' one HTTP process that
+    # routes inference to SERVE_WORKERS model processes (0 = CPU count). Each
+    # worker gets SERVE_THREADS_PER_WORKER math threads (0 = CPUs / workers).
+    # SERVE_PRELOAD_MODELS load once before forking and are shared
+    # copy-on-write (the sentiment model and stemmer serve the review
+    # endpoints in every HTTP process); TensorFlow and ONNX Runtime models
+    # must not be listed
+    SERVE_MODE = os.environ.get('SERVE_MODE', 'prefork')
+    SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', 0))
+    SERVE_THREADS_PER_WORKER = int(os.environ.get('SERVE_THREADS_PER_WORKER', 0))
+    SERVE_PRELOAD_MODELS = [name.strip() for name in os.environ.get(
+        'SERVE_PRELOAD_MODELS', 'toyota_price,yolov8_damage,sentiment,porter_stemmer').split(',')
+        if name.strip()]
@@ -1,19 +1,67 @@
 import os
 import sys
+import json
 import sqlite3
-from flask import Flask, request, jsonify
+from itertools import islice
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from db import db
+import data_access
+from log_sink import log_sink
+import migrations
+from geo import nearby_stores
+from product_search import search_products
+from market_trends import market_trends
+from damage_reports import FILTER_COLUMNS, InvalidCursor, aggregate_reports, list_reports
+from report_writer import report_writer
+from job_queue import job_queue
 from Config import Config
 from routes.store_routes import store_bp
-from helper import preprocessing, vectorizer, get_prediction
+from review_store import ReviewAggregator
+from helper import preprocessing, vectorizer, get_prediction, classify_reviews
 from controllers.damage_detection_controller import damage_detection
 from controllers.tire_segmentation_controller import tire_segmentation
 from controllers.vehicle_classification_controller import vehicle_classification
+from services.model_registry import registry
+from services.result_cache import result_cache
+from inference_pool import inference_pool
 from datetime import datetime
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
+# How long /health and /inference_cache/stats wait for a busy inference worker
+_WORKER_STATS_TIMEOUT = 2.0
+
+
+def _worker_models():
+    # Runs in an inference worker after its warm-up, so a model it serves is either loaded or failed
+    status = registry.status()
+    return {'models_ready': all(model['state'] != 'failed' for model in status.values()), 'models': status}
+
+
+def _worker_cache_stats():
+    return result_cache.stats()
+
+
+def _worker_reports(fn):
+    """Per-worker results of fn under serve.py --mode dispatch, None in a single process."""
+    if not inference_pool.enabled():
+        return None
+    return [dict(result, pid=pid) if result is not None else {'pid': pid, 'state': 'busy'}
+            for pid, result in inference_pool.gather(fn, timeout=_WORKER_STATS_TIMEOUT)]
+
+
+def shutdown(app=None):
+    """
+    Flushes this process's background writers: queued damage reports and log
+    rows, and the review counters of `app` if given. For processes that end
+    with os._exit, which skips the writers' atexit hooks.
+    """
+    if app is not None:
+        app.extensions['reviews'].close()
+    report_writer.close()
+    log_sink.close()
+
 
 def create_app():
     app = Flask(__name__)
@@ -21,7 +69,8 @@ def create_app():
 
     # Initialize DB and CORS
     db.init_app(app)
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    # Browsers only let scripts read response headers that are exposed (the report list's paging cursor)
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=['X-Next-Cursor'])
 
     # Register blueprints
     app.register_blueprint(store_bp, url_prefix='/api')
@@ -29,88 +78,70 @@ def create_app():
     app.register_blueprint(tire_segmentation, url_prefix='/tire_segmentation')
     app.register_blueprint(vehicle_classification, url_prefix='/vehicle_classification')
 
-    # Sentiment analysis variables
-    app.config["reviews"] = []
-    app.config["positive"] = 0
-    app.config["negative"] = 0
-
-    # Initialize all necessary tables in SQLite
+    # Create or upgrade the SQLite schema (versioned; see migrations.py)
     def init_db():
-        with app.app_context():
-            conn = sqlite3.connect('stores.db')
-            c = conn.cursor()
-            # Stores table
-            c.execute('''CREATE TABLE IF NOT EXISTS stores
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          store_name TEXT NOT NULL,
-                          store_type TEXT NOT NULL,
-                          store_description TEXT,
-                          contact_number TEXT NOT NULL,
-                          email TEXT NOT NULL,
-                          password TEXT NOT NULL,
-                          latitude REAL NOT NULL,
-                          longitude REAL NOT NULL)''')
-
-            # Logs table
-            c.execute('''CREATE TABLE IF NOT EXISTS logs
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                          level TEXT NOT NULL,
-                          message TEXT NOT NULL,
-                          user_email TEXT,
-                          endpoint TEXT NOT NULL)''')
-
-            # Products table
-            c.execute('''CREATE TABLE IF NOT EXISTS products
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          store_id INTEGER NOT NULL,
-                          name TEXT NOT NULL,
-                          price REAL NOT NULL,
-                          stock BOOLEAN NOT NULL,
-                          FOREIGN KEY (store_id) REFERENCES stores (id))''')
-
-            # Vehicle repair costs table
-            c.execute('''CREATE TABLE IF NOT EXISTS repair_costs
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          vehicle TEXT NOT NULL,
-                          part TEXT NOT NULL,
-                          new_price_low INTEGER NOT NULL,
-                          new_price_high INTEGER NOT NULL,
-                          repair_value_low INTEGER NOT NULL,
-                          repair_value_high INTEGER NOT NULL,
-                          UNIQUE(vehicle, part))''')
-
-            # Damage reports table
-            c.execute('''CREATE TABLE IF NOT EXISTS damage_reports
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          vehicle TEXT NOT NULL,
-                          body_type TEXT NOT NULL,
-                          damage_type TEXT NOT NULL,
-                          repairability TEXT NOT NULL,
-                          repair_cost INTEGER NOT NULL,
-                          image_path TEXT,
-                          created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-
-            conn.commit()
-            conn.close()
+        with app.app_context(), data_access.connection() as c:
+            migrations.migrate(c)
 
     init_db()
 
-    # Logging function
+    # Workers for ?async=1 inference jobs (restarted automatically after fork)
+    job_queue.start()
+
+    # Load models in the background so startup does not wait on TF/torch
+    if app.config["MODEL_WARMUP"]:
+        registry.warm_up_async(dummy_inference=app.config["MODEL_WARMUP_DUMMY_INFERENCE"])
+
+    # Sentiment analysis aggregation (recent reviews, counters, store rollups)
+    reviews = ReviewAggregator(capacity=app.config["REVIEW_BUFFER_CAPACITY"],
+                               flush_interval=app.config["REVIEW_FLUSH_INTERVAL"])
+    app.extensions['reviews'] = reviews
+
+    # Logging function (queued; written to the logs table in the background)
     def log_to_db(level, message, user_email=None, endpoint=None):
-        try:
-            conn = sqlite3.connect('stores.db')
-            c = conn.cursor()
-            c.execute('''INSERT INTO logs (level, message, user_email, endpoint)
-                         VALUES (?, ?, ?, ?)''',
-                      (level, message, user_email, endpoint))
-            conn.commit()
-        except sqlite3.OperationalError as e:
-            print(f"Database error: {e}")
-        finally:
-            conn.close()
+        log_sink.log(level, message, user_email, endpoint)
 
 
+    # Health check with per-model readiness (and per inference worker under serve.py --mode dispatch)
+    @app.route('/health', methods=['GET'])
+    def health():
+        workers = _worker_reports(_worker_models)
+        if workers is None:
+            return jsonify({
+                "status": "ok",
+                "models_ready": registry.ready(),
+                "models": registry.status()
+            }), 200
+        return jsonify({
+            "status": "ok",
+            "models_ready": all(worker.get('models_ready') for worker in workers),
+            "models": registry.status(),
+            "workers": workers
+        }), 200
+
+    # Status of an ?async=1 inference job; ?wait=<seconds> long-polls until it finishes
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        wait = request.args.get('wait', default=0, type=float)
+        wait = max(0.0, min(wait, app.config['JOB_LONG_POLL_MAX']))
+        job = job_queue.wait(job_id, wait) if wait else job_queue.get(job_id)
+        if job is None:
+            return jsonify({'message': 'Job not found'}), 404
+        return jsonify(job), 200
+
+    # Queue depth, job states, latencies and this process's counters
+    @app.route('/jobs/metrics', methods=['GET'])
+    def job_metrics():
+        return jsonify(job_queue.metrics()), 200
+
+    # Hit/miss counters of the inference result cache (each inference worker has its own)
+    @app.route('/inference_cache/stats', methods=['GET'])
+    def inference_cache_stats():
+        workers = _worker_reports(_worker_cache_stats)
+        if workers is None:
+            return jsonify(result_cache.stats()), 200
+        return jsonify({'workers': workers}), 200
+
     # Store registration
     @app.route('/register', methods=['POST'])
     def register_store():
@@ -129,17 +160,12 @@ def create_app():
             return jsonify({'message': 'All fields are required'}), 400
 
         try:
-            conn = sqlite3.connect('stores.db')
-            c = conn.cursor()
-            c.execute('''INSERT INTO stores (store_name, store_type, store_description, contact_number, email, password, latitude, longitude)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                      (store_name, store_type, store_description, contact_number, email, password, latitude, longitude))
-            conn.commit()
+            data_access.execute('''INSERT INTO stores (store_name, store_type, store_description, contact_number, email, password, latitude, longitude)
+                                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                                (store_name, store_type, store_description, contact_number, email, password, latitude, longitude))
         except sqlite3.OperationalError as e:
             log_to_db('ERROR', f'Database error: {e}', email, '/register')
             return jsonify({'message': 'Database error'}), 500
-        finally:
-            conn.close()
 
         log_to_db('INFO', 'Store registered successfully', email, '/register')
         return jsonify({'message': 'Store registered successfully'}), 201
@@ -155,11 +181,7 @@ def create_app():
             log_to_db('ERROR', 'Login attempt with missing fields', email, '/login')
             return jsonify({'message': 'Email and password are required'}), 400
 
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM stores WHERE email = ? AND password = ?', (email, password))
-        user = c.fetchone()
-        conn.close()
+        user = data_access.query_one('SELECT * FROM stores WHERE email = ? AND password = ?', (email, password))
 
         if user:
             log_to_db('INFO', 'Login successful', email, '/login')
@@ -171,11 +193,7 @@ def create_app():
     # Get store details
     @app.route('/store/<int:store_id>', methods=['GET'])
     def get_store(store_id):
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM stores WHERE id = ?', (store_id,))
-        store = c.fetchone()
-        conn.close()
+        store = data_access.query_one('SELECT * FROM stores WHERE id = ?', (store_id,))
 
         if store:
             return jsonify({
@@ -191,6 +209,54 @@ def create_app():
         else:
             return jsonify({'message': 'Store not found'}), 404
 
+    # Nearest stores within a radius (km), ordered by distance
+    @app.route('/stores/nearby', methods=['GET'])
+    def get_nearby_stores():
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius = request.args.get('radius', default=10.0, type=float)
+        limit = request.args.get('limit', default=20, type=int)
+
+        if lat is None or lon is None:
+            return jsonify({'message': 'lat and lon are required'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius <= 0:
+            return jsonify({'message': 'Invalid coordinates or radius'}), 400
+
+        limit = max(1, min(limit, app.config['NEARBY_STORES_MAX_LIMIT']))
+        return jsonify(nearby_stores(lat, lon, radius, limit)), 200
+
+    # Ranked spare-part search, optionally limited to stores near a location
+    @app.route('/products/search', methods=['GET'])
+    def search_parts():
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'message': 'q is required'}), 400
+
+        fuzzy = request.args.get('fuzzy')
+        if fuzzy is not None:
+            fuzzy = fuzzy.lower() in ('1', 'true', 'yes')
+
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius = request.args.get('radius', type=float)
+        if (lat is None) != (lon is None):
+            return jsonify({'message': 'lat and lon must be given together'}), 400
+        if lat is not None and radius is None:
+            radius = 10.0
+
+        limit = request.args.get('limit', default=20, type=int)
+        limit = max(1, min(limit, app.config['PRODUCT_SEARCH_MAX_LIMIT']))
+
+        results = search_products(
+            query,
+            in_stock=request.args.get('in_stock', '').lower() in ('1', 'true', 'yes'),
+            min_price=request.args.get('min_price', type=float),
+            max_price=request.args.get('max_price', type=float),
+            lat=lat, lon=lon, radius_km=radius,
+            limit=limit, fuzzy=fuzzy,
+        )
+        return jsonify(results), 200
+
     # Add product to store
     @app.route('/store/<int:store_id>/add-product', methods=['POST'])
     def add_product(store_id):
@@ -202,14 +268,9 @@ def create_app():
         if not name or not price:
             return jsonify({'message': 'Name and price are required'}), 400
 
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO products (store_id, name, price, stock)
-                     VALUES (?, ?, ?, ?)''',
-                  (store_id, name, price, stock))
-        conn.commit()
-        product_id = c.lastrowid
-        conn.close()
+        product_id = data_access.execute('''INSERT INTO products (store_id, name, price, stock)
+                                            VALUES (?, ?, ?, ?)''',
+                                         (store_id, name, price, stock))
 
         return jsonify({
             'id': product_id,
@@ -224,27 +285,117 @@ def create_app():
     def predict():
         data = request.json
         text = data.get("text", "").strip()
+        store_id = data.get("store_id")
 
         if not text:
             return jsonify({"error": "No text provided"}), 400
+        if isinstance(store_id, str) and store_id.isdigit():
+            store_id = int(store_id)
+        if store_id is not None and not data_access.is_int64(store_id):
+            return jsonify({"error": "store_id must be a 64-bit integer"}), 400
 
         processed_text = preprocessing(text)
         vectorized_text = vectorizer(processed_text)
         prediction = get_prediction(vectorized_text)
 
-        if prediction == "negative":
-            app.config["negative"] += 1
+        reviews.record(text, prediction, store_id)
+
+        return jsonify({"prediction": prediction, **reviews.snapshot(limit=5)})
+
+    # Per-store sentiment rollup
+    @app.route('/store/<int:store_id>/sentiment', methods=['GET'])
+    def store_sentiment(store_id):
+        return jsonify({"store_id": store_id, **reviews.store_summary(store_id)})
+
+    # Bulk sentiment analysis: reviews come from a JSON array, an NDJSON upload
+    # or a store's feedback history, and results are streamed back as NDJSON
+    # one chunk at a time so memory stays flat for large inputs
+    def iter_json_items(data):
+        for index, item in enumerate(data):
+            yield index, item
+
+    def iter_ndjson_items(stream):
+        index = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            yield index, item
+            index += 1
+
+    def iter_feedback_items(store_id, chunk_size):
+        # Keyset pagination keeps each read short and independent of the write-back
+        last_id = 0
+        index = 0
+        while True:
+            rows = data_access.query_all('''SELECT id, comment FROM feedback
+                                            WHERE store_id = ? AND id > ?
+                                            ORDER BY id LIMIT ?''',
+                                         (store_id, last_id, chunk_size))
+            if not rows:
+                return
+            for feedback_id, comment in rows:
+                yield index, {"id": feedback_id, "text": comment}
+                index += 1
+            last_id = rows[-1][0]
+
+    def classify_chunk(chunk, write_back):
+        results = []
+        valid = []
+        for index, item in chunk:
+            if isinstance(item, str):
+                item = {"text": item}
+            elif not isinstance(item, dict):
+                item = {}
+            result = {"index": index}
+            if item.get("id") is not None:
+                result["id"] = item["id"]
+            text = item.get("text")
+            text = text.strip() if isinstance(text, str) else ""
+            if not text:
+                result["error"] = "No text provided"
+            else:
+                valid.append((result, text))
+            results.append(result)
+
+        predictions = classify_reviews([text for _, text in valid])
+        for (result, _), prediction in zip(valid, predictions):
+            result["prediction"] = prediction
+
+        if write_back:
+            updates = [(r["prediction"], r["id"]) for r in results if "prediction" in r and "id" in r]
+            if updates:
+                data_access.executemany('UPDATE feedback SET sentiment = ? WHERE id = ?', updates)
+        return results
+
+    @app.route('/predict/batch', methods=['POST'])
+    def predict_batch():
+        chunk_size = app.config["SENTIMENT_BATCH_CHUNK_SIZE"]
+        write_back = request.args.get('write_back', '').lower() in ('1', 'true', 'yes')
+        store_id = request.args.get('store_id', type=int)
+
+        if store_id is not None:
+            items = iter_feedback_items(store_id, chunk_size)
+        elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            items = iter_ndjson_items(request.stream)
         else:
-            app.config["positive"] += 1
+            data = request.get_json(silent=True)
+            if not isinstance(data, list):
+                return jsonify({"error": "Expected a JSON array of reviews or an NDJSON body"}), 400
+            items = iter_json_items(data)
 
-        app.config["reviews"].insert(0, {"text": text, "prediction": prediction})
+        def generate():
+            while True:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    break
+                for result in classify_chunk(chunk, write_back):
+                    yield json.dumps(result) + "\n"
 
-        return jsonify({
-            "prediction": prediction,
-            "positive_count": app.config["positive"],
-            "negative_count": app.config["negative"],
-            "recent_reviews": app.config["reviews"][:5]
-        })
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
     # Log messages endpoint
     @app.route('/log', methods=['POST'])
@@ -281,14 +432,10 @@ def create_app():
             damage_type = prediction.get('damage_type', 'Unknown')
             repairability = prediction.get('repairability', 'Unknown')
 
-            conn = sqlite3.connect('stores.db')
-            c = conn.cursor()
-            c.execute('''SELECT new_price_low, new_price_high, repair_value_low, repair_value_high
-                         FROM repair_costs
-                         WHERE vehicle = ? AND part = ?''',
-                      (vehicle, body_type))
-            price_data = c.fetchone()
-            conn.close()
+            price_data = data_access.query_one('''SELECT new_price_low, new_price_high, repair_value_low, repair_value_high
+                                                  FROM repair_costs
+                                                  WHERE vehicle = ? AND part = ?''',
+                                               (vehicle, body_type))
 
             if not price_data:
                 fallback_new_price_range = "Rs. 35,000 - 60,000"
@@ -327,37 +474,38 @@ def create_app():
         except Exception as e:
             return jsonify({"status": "error", "error": str(e)}), 500
 
-    # Get damage reports endpoint
+    # Get damage reports endpoint: newest first, filterable by vehicle,
+    # body_type, damage_type and repairability. The body stays a plain list;
+    # the cursor for the next page comes back in the X-Next-Cursor header.
+    # With aggregate=1, returns counts and repair-cost sums per vehicle and part
     @app.route('/damage_reports', methods=['GET'])
     def get_damage_reports():
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM damage_reports ORDER BY created_at DESC LIMIT 50')
-        reports = c.fetchall()
-        conn.close()
-
-        report_list = []
-        for report in reports:
-            report_list.append({
-                "id": report[0],
-                "vehicle": report[1],
-                "body_type": report[2],
-                "damage_type": report[3],
-                "repairability": report[4],
-                "repair_cost": report[5],
-                "created_at": report[7]
-            })
+        filters = {column: request.args.get(column) for column in FILTER_COLUMNS}
 
-        return jsonify(report_list)
+        if request.args.get('aggregate', '').lower() in ('1', 'true', 'yes'):
+            return jsonify(aggregate_reports(filters)), 200
+
+        limit = request.args.get('limit', default=50, type=int)
+        limit = max(1, min(limit, app.config['DAMAGE_REPORTS_MAX_LIMIT']))
+        try:
+            reports, next_cursor = list_reports(filters, request.args.get('cursor'), limit)
+        except InvalidCursor:
+            return jsonify({'message': 'Invalid cursor'}), 400
+
+        response = jsonify(reports)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    # Report thumbnails are named by content hash, so they never change
+    @app.route('/damage_reports/thumbnails/<name>', methods=['GET'])
+    def damage_report_thumbnail(name):
+        return send_from_directory(report_writer.thumbnail_dir(), name, max_age=365 * 24 * 3600)
 
     # Get shop locations endpoint
     @app.route('/shop_locations', methods=['GET'])
     def get_locations():
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('SELECT DISTINCT location_id, location_name FROM shop_locations')
-        rows = c.fetchall()
-        conn.close()
+        rows = data_access.query_all('SELECT DISTINCT location_id, location_name FROM shop_locations')
         locations = [{"id": loc_id, "name": loc_name} for loc_id, loc_name in rows]
         return jsonify(locations)
 
@@ -368,13 +516,9 @@ def create_app():
         if not location_id:
             return jsonify({"error": "location_id is required"}), 400
 
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('''SELECT rank, shop_name, address, phone, mapslink
-                     FROM shop_locations WHERE location_id = ? ORDER BY rank''',
-                  (location_id,))
-        rows = c.fetchall()
-        conn.close()
+        rows = data_access.query_all('''SELECT rank, shop_name, address, phone, mapslink
+                                        FROM shop_locations WHERE location_id = ? ORDER BY rank''',
+                                     (location_id,))
 
         shops = [{
             "rank": r,
@@ -400,31 +544,56 @@ def create_app():
         if vehicle_type.startswith("Toyota_"):
             vehicle_type = vehicle_type.replace("Toyota_", "")
 
-        conn = sqlite3.connect('stores.db')
-        cursor = conn.cursor()
+        try:
+            model_year = int(model_year)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'model_year must be an integer'}), 400
 
-        query = '''
-            SELECT year_2020, year_2021, year_2022, year_2023, year_2024
-            FROM vehicle_market_analysis
-            WHERE vehicle_type = ? AND model_year = ?
-        '''
-        cursor.execute(query, (vehicle_type, int(model_year)))
-        row = cursor.fetchone()
-        conn.close()
+        # Served from the in-memory copy; an unchanged table answers If-None-Match with 304
+        snapshot = market_trends.snapshot()
+        if request.if_none_match.contains(snapshot.etag):
+            return trends_not_modified(snapshot.etag)
 
-        if not row:
+        entry = snapshot.entries.get((vehicle_type, model_year))
+        if not entry:
             print(f"No data found for vehicle_type={vehicle_type} and model_year={model_year}")
             return jsonify({'status': 'error', 'message': 'No data found for given parameters'}), 404
 
-        data = {
-            '2020': row[0],
-            '2021': row[1],
-            '2022': row[2],
-            '2023': row[3],
-            '2024': row[4],
-        }
+        return trends_response({'status': 'success', **entry}, snapshot.etag)
+
+    # All model years of one vehicle type, with the same derived series
+    @app.route('/vehicle_price_trends/<vehicle_type>', methods=['GET'])
+    def vehicle_price_trends_by_type(vehicle_type):
+        if vehicle_type.startswith("Toyota_"):
+            vehicle_type = vehicle_type.replace("Toyota_", "")
 
-        return jsonify({'status': 'success', 'data': data})
+        snapshot = market_trends.snapshot()
+        if request.if_none_match.contains(snapshot.etag):
+            return trends_not_modified(snapshot.etag)
+
+        model_years = snapshot.by_type.get(vehicle_type)
+        if not model_years:
+            return jsonify({'status': 'error', 'message': 'No data found for given vehicle_type'}), 404
+
+        return trends_response({
+            'status': 'success',
+            'vehicle_type': vehicle_type,
+            'model_years': {
+                str(model_year): snapshot.entries[(vehicle_type, model_year)] for model_year in model_years
+            }
+        }, snapshot.etag)
+
+    def trends_response(payload, etag):
+        response = jsonify(payload)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    def trends_not_modified(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
 
     return app
 
@@ -0,0 +1,90 @@
+"""
+Throughput / latency benchmark for the damage detection micro-batcher.
+
+Runs DamageDetectionService.predict_batch directly at fixed batch sizes, then
+pushes the same number of images through the MicroBatcher from concurrent
+client threads, the way /damage_detection/upload does under load.
+
+Usage (from python-backend/):
+    python -m benchmarks.damage_batching --images 64 --sizes 1 4 8 16
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.batching import MicroBatcher
+from services.damage_detection_service import DamageDetectionService
+
+
+def _synthetic_images(count, size=(1280, 960)):
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def bench_direct(service, images, batch_size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        t0 = time.perf_counter()
+        service.predict_batch(images[i:i + batch_size])
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return len(images) / elapsed, latencies
+
+
+def bench_batcher(service, images, batch_size, max_wait_ms):
+    batcher = MicroBatcher(service.predict_batch, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+
+    def one(image):
+        t0 = time.perf_counter()
+        batcher(image)
+        latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(batch_size, 1) * 2) as pool:
+        list(pool.map(one, images))
+    elapsed = time.perf_counter() - start
+    return len(images) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=64)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    service = DamageDetectionService()
+    images = _synthetic_images(args.images)
+
+    # Warm up both graphs so the first measured batch does not pay for tracing
+    for size in args.sizes:
+        service.predict_batch(images[:size])
+
+    print(f"{'mode':<8} {'batch':>5} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, bench in (('direct', bench_direct), ('batcher', bench_batcher)):
+        for size in args.sizes:
+            if mode == 'direct':
+                throughput, latencies = bench(service, images, size)
+            else:
+                throughput, latencies = bench(service, images, size, args.max_wait_ms)
+            print(f"{mode:<8} {size:>5} {throughput:>8.2f} "
+                  f"{statistics.median(latencies) * 1000:>8.1f} {_percentile(latencies, 95) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Per-model latency of Keras predict() against the inference runner.
+
+For each Keras model the same random batch is run through model.predict
+(the old code path), an eager model(x, training=False) call and the cached
+tf.function, and the median / p95 latency of each is reported. The first
+call of every mode is timed separately, since that is where tracing happens.
+
+Usage (from python-backend/):
+    python -m benchmarks.inference_runner --repeat 50 --batch 1
+    python -m benchmarks.inference_runner --models unet_tire resnet50_tire --batch 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.damage_detection_service  # noqa: F401  (registers the models)
+import services.tire_segmentation_service  # noqa: F401
+import services.vehicle_classification_service  # noqa: F401
+from services.inference import INFERENCE_MODES, InferenceRunner
+from services.model_registry import registry
+
+MODELS = {
+    'efficientnetv2_damage': (224, 224, 3),
+    'resnet50_tire': (224, 224, 3),
+    'unet_tire': (256, 256, 1),
+    'mobilenetv2_vehicle': (224, 224, 3),
+}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def bench(name, input_shape, mode, batch_size, repeat):
+    run = InferenceRunner(name, input_shape, mode)
+    batch = np.random.default_rng(0).random((batch_size,) + input_shape, dtype=np.float32)
+    start = time.perf_counter()
+    reference = run(batch)
+    first = time.perf_counter() - start
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(batch)
+        timings.append(time.perf_counter() - start)
+    return first, timings, reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--batch', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    for name in args.models:
+        registry.get(name)
+        print(f"{name} (batch {args.batch})")
+        outputs = {}
+        for mode in ('predict',) + tuple(m for m in INFERENCE_MODES if m != 'predict'):
+            first, timings, outputs[mode] = bench(name, MODELS[name], mode, args.batch, args.repeat)
+            print(f"    {mode:8s}  first {first * 1000:8.1f} ms   "
+                  f"p50 {statistics.median(timings) * 1000:7.2f} ms   p95 {_percentile(timings, 95) * 1000:7.2f} ms")
+        drift = max(float(np.max(np.abs(outputs[mode] - outputs['predict']))) for mode in outputs)
+        print(f"    max abs difference from predict(): {drift:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Query plans and latency of the hot lookups before and after the index migration.
+
+Builds a throw-away database at schema version 2 (tables only), fills it with
+synthetic rows (1M logs and 100k damage reports by default), times each query,
+then applies the remaining migrations and times them again.
+
+Usage (from python-backend/):
+    python -m benchmarks.schema_indexes --logs 1000000 --reports 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import migrations
+
+_VEHICLES = ['Toyota Aqua', 'Toyota Prius', 'Honda Fit', 'Suzuki Alto', 'Nissan Leaf', 'Toyota Axio']
+_PARTS = ['Front Bumper', 'Rear Bumper', 'Bonnet', 'Left Door', 'Right Door', 'Boot Lid', 'Headlight']
+_ENDPOINTS = ['/login', '/register', '/predict', '/products/search', '/stores/nearby', '/damage_detection/upload']
+
+QUERIES = {
+    'recent damage reports': (
+        'SELECT * FROM damage_reports ORDER BY created_at DESC LIMIT 50', ()),
+    'repair cost lookup': (
+        '''SELECT new_price_low, new_price_high, repair_value_low, repair_value_high
+           FROM repair_costs WHERE vehicle = ? AND part = ?''', ('Toyota Aqua', 'Bonnet')),
+    'logs of one endpoint, newest first': (
+        'SELECT * FROM logs WHERE endpoint = ? ORDER BY timestamp DESC LIMIT 100', ('/predict',)),
+    'logs in a one-hour window': (
+        'SELECT COUNT(*) FROM logs WHERE timestamp >= ? AND timestamp < ?',
+        ('2024-03-01 10:00:00', '2024-03-01 11:00:00')),
+    'market trend lookup': (
+        '''SELECT year_2020, year_2021, year_2022, year_2023, year_2024
+           FROM vehicle_market_analysis WHERE vehicle_type = ? AND model_year = ?''', ('Prius', 2013)),
+    'store feedback rollup': (
+        'SELECT sentiment, COUNT(*) FROM feedback WHERE store_id = ? GROUP BY sentiment', (42,)),
+}
+
+
+def _timestamps(count, start=datetime(2024, 1, 1)):
+    step = timedelta(days=365) / count
+    return [(start + step * i).strftime('%Y-%m-%d %H:%M:%S') for i in range(count)]
+
+
+def populate(conn, logs, reports, feedback):
+    rng = random.Random(0)
+    with conn:
+        conn.executemany('INSERT INTO logs (timestamp, level, message, user_email, endpoint) VALUES (?, ?, ?, ?, ?)',
+                         ((ts, 'INFO', 'request handled', f'user{rng.randrange(5000)}@example.com',
+                           rng.choice(_ENDPOINTS)) for ts in _timestamps(logs)))
+        conn.executemany('''INSERT INTO damage_reports
+                            (vehicle, body_type, damage_type, repairability, repair_cost, image_path, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         ((rng.choice(_VEHICLES), rng.choice(_PARTS), rng.choice(['Dent', 'Scratch']),
+                           rng.choice(['Repairable', 'Not Repairable']), rng.randrange(5000, 200000), None, ts)
+                          for ts in _timestamps(reports)))
+        conn.executemany('''INSERT OR IGNORE INTO repair_costs
+                            (vehicle, part, new_price_low, new_price_high, repair_value_low, repair_value_high)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         ((f'{vehicle} {i}' if i else vehicle, part, 1, 2, 3, 4)
+                          for i in range(200) for vehicle in _VEHICLES for part in _PARTS))
+        conn.executemany('INSERT INTO vehicle_market_analysis VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         ((f'Model{m}' if m else 'Prius', year, 1, 2, 3, 4, 5)
+                          for m in range(500) for year in range(2000, 2024)))
+        conn.executemany('INSERT INTO feedback (store_id, comment, sentiment) VALUES (?, ?, ?)',
+                         ((rng.randrange(1000), 'ok', rng.choice(['positive', 'negative'])) for _ in range(feedback)))
+
+
+def measure(conn, repeat):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - start)
+        results[name] = (statistics.median(timings) * 1000, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=1_000_000)
+    parser.add_argument('--reports', type=int, default=100_000)
+    parser.add_argument('--feedback', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        migrations.migrate(conn, target=2)
+        start = time.perf_counter()
+        populate(conn, args.logs, args.reports, args.feedback)
+        print(f"Populated in {time.perf_counter() - start:.1f}s")
+
+        before = measure(conn, args.repeat)
+        start = time.perf_counter()
+        migrations.migrate(conn)
+        print(f"Migrated to version {migrations.schema_version(conn)} in {time.perf_counter() - start:.1f}s\n")
+        after = measure(conn, args.repeat)
+        conn.close()
+
+    for name in QUERIES:
+        (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+        print(f"{name}: {before_ms:.3f} ms -> {after_ms:.3f} ms")
+        print(f"    before: {before_plan}")
+        print(f"    after:  {after_plan}")
+
+
+if __name__ == '__main__':
+    main()
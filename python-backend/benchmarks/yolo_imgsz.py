@@ -0,0 +1,96 @@
+"""
+Latency and accuracy of the YOLOv8 repairability check across input sizes.
+
+The reference decision is the old code path: a 640 px input, ultralytics'
+default NMS (conf 0.25, up to 300 boxes) and a conf > YOLO_CONF check on the
+boxes. Each --sizes entry then runs the tuned settings (conf and max_det
+pushed into NMS) on letterboxed inputs of that size, and reports latency per
+image and agreement with the reference. Photos sorted into Repairable/ and
+Unrepairable/ subdirectories of --images are also scored against those labels.
+
+Usage (from python-backend/):
+    python -m benchmarks.yolo_imgsz --images samples/damage --sizes 320 480 640
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.damage_detection_service import repairable, yolo_settings
+from services.image_pipeline import DecodedImage, Letterbox
+from services.model_registry import registry
+
+LABELS = {'repairable': True, 'unrepairable': False}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def load_images(images_dir, count):
+    """(PIL image, label or None) pairs; synthetic noise when no directory is given."""
+    if not images_dir:
+        rng = np.random.default_rng(0)
+        return [(Image.fromarray(rng.integers(0, 255, (960, 1280, 3), dtype=np.uint8)), None)
+                for _ in range(count)]
+    samples = []
+    for path in sorted(glob.glob(os.path.join(images_dir, '**', '*.*'), recursive=True)):
+        if path.lower().endswith(('.jpg', '.jpeg', '.png')):
+            label = LABELS.get(os.path.basename(os.path.dirname(path)).lower())
+            samples.append((DecodedImage.from_path(path).image, label))
+    return samples[:count]
+
+
+def run(model, images, imgsz, settings):
+    letterbox = Letterbox(imgsz)
+    decisions, timings = [], []
+    for image in images:
+        start = time.perf_counter()
+        decisions.extend(repairable(model(letterbox([image]), **settings)))
+        timings.append(time.perf_counter() - start)
+    return np.array(decisions), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of damage photos (default: synthetic noise)')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[320, 480, 640])
+    args = parser.parse_args()
+
+    samples = load_images(args.images, args.count)
+    images = [image for image, _ in samples]
+    labeled = [i for i, (_, label) in enumerate(samples) if label is not None]
+    labels = np.array([samples[i][1] for i in labeled], dtype=bool)
+
+    model = registry.get('yolov8_damage')
+    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+    reference, timings = run(model, images, 640, {'imgsz': 640, 'verbose': False})
+    rows = [('reference 640', timings, reference)]
+    for imgsz in args.sizes:
+        settings = yolo_settings(imgsz=imgsz)
+        model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), **settings)
+        decisions, timings = run(model, images, imgsz, settings)
+        rows.append((f"tuned {imgsz}", timings, decisions))
+
+    print(f"{len(images)} images, {len(labeled)} labeled")
+    for name, timings, decisions in rows:
+        line = (f"{name:14s} p50 {statistics.median(timings) * 1000:7.2f} ms  "
+                f"p95 {_percentile(timings, 95) * 1000:7.2f} ms  "
+                f"agreement {np.mean(decisions == reference):.3f}")
+        if labeled:
+            line += f"  accuracy {np.mean(decisions[labeled] == labels):.3f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,86 @@
 from flask import Blueprint, request, jsonify
-import sqlite3
+import data_access
+from report_writer import estimate_repair_cost, report_writer
 from services.damage_detection_service import DamageDetectionService
+from services.image_pipeline import DecodedImage
+from services.result_cache import result_cache
+from job_queue import accepted, async_requested, job_queue
+from inference_pool import inference_pool
 
 damage_detection = Blueprint('damage_detection', __name__)
 
 _detection_service = DamageDetectionService()
 
+def _assess_damage(data, filename, vehicle, body_type, strict=False):
+    # Repeat uploads of the same photo are answered from the result cache
+    prediction = result_cache.get_or_compute(
+        'damage', data,
+        lambda: _detection_service.predict_damage_and_repairability(
+            DecodedImage(data, filename=filename, draft_size=640)),
+        # Either model failing yields 'Unknown' for its field: never cache that
+        cacheable=lambda result: 'Unknown' not in (result.get('damage_type'), result.get('repairability')),
+    )
+    damage_type = prediction.get('damage_type', 'Unknown')
+    repairability = prediction.get('repairability', 'Unknown')
+    if strict and 'Unknown' in (damage_type, repairability):
+        # The service swallows model errors; jobs raise so the queue retries them
+        raise RuntimeError(f"Damage prediction failed: {damage_type} / {repairability}")
+
+    # Fetch the formatted strings directly from your DB
+    price_data = data_access.query_one('''
+        SELECT new_price_range, repair_value_low, repair_value_high
+        FROM repair_costs
+        WHERE vehicle = ? AND part = ?
+    ''', (vehicle, body_type))
+
+    if not price_data:
+        # Not persisted: the fallback costs are placeholders, and a report with
+        # them would skew the repair cost sums of /damage_reports?aggregate=1
+        return {
+            "status": "error",
+            "error": "No price data available",
+            "fallback_data": {
+                "vehicle": vehicle,
+                "body_type": body_type,
+                "damage_type": damage_type,
+                "repairability": repairability,
+                "new_price_range": "Rs. 35,000 - 60,000",
+                "repair_cost_range": "Rs. 8,000 - 15,000",
+                "repair_cost_low": "Rs. 8,000 - 15,000",
+                "repair_cost_high": "Rs. 8,000 - 15,000"
+            }
+        }
+
+    new_price_range, repair_low, repair_high = price_data
+
+    if repairability == "Repairable":
+        repair_cost_range = repair_low
+    else:
+        repair_cost_range = repair_high
+
+    # Image, thumbnail and damage_reports row are written in the background
+    report_writer.submit(data, vehicle, body_type, damage_type, repairability,
+                         estimate_repair_cost(repair_cost_range))
+
+    return {
+        "status": "success",
+        "vehicle": vehicle,
+        "body_type": body_type,
+        "damage_type": damage_type,
+        "repairability": repairability,
+        "new_price_range": new_price_range,
+        "repair_cost_range": repair_cost_range,
+        "repair_cost_low": repair_cost_range,
+        "repair_cost_high": repair_cost_range
+    }
+
+
+# Both paths run the models through inference_pool (worker processes under serve.py --mode dispatch)
+job_queue.register('damage_detection', lambda payload, params: inference_pool.run(
+    _assess_damage, payload, params.get('filename'), params.get('vehicle'), params.get('body_type'), True))
+
+
+# ?async=1 queues a job and returns its id instead of waiting for the models
 @damage_detection.route('/upload', methods=['POST'])
 def upload_image():
     if 'image' not in request.files:
@@ -19,58 +94,13 @@ def upload_image():
         if not all([vehicle, body_type]):
             return jsonify({"error": "Missing vehicle or body type"}), 400
 
-        # Use the already-loaded service
-        prediction = _detection_service.predict_damage_and_repairability(image)
-        damage_type = prediction.get('damage_type', 'Unknown')
-        repairability = prediction.get('repairability', 'Unknown')
-
-        # Fetch the formatted strings directly from your DB
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('''
-            SELECT new_price_range, repair_value_low, repair_value_high
-            FROM repair_costs
-            WHERE vehicle = ? AND part = ?
-        ''', (vehicle, body_type))
-        price_data = c.fetchone()
-        conn.close()
-
-        if not price_data:
-            return jsonify({
-                "status": "error",
-                "error": "No price data available",
-                "fallback_data": {
-                    "vehicle": vehicle,
-                    "body_type": body_type,
-                    "damage_type": damage_type,
-                    "repairability": repairability,
-                    "new_price_range": "Rs. 35,000 - 60,000",
-                    "repair_cost_range": "Rs. 8,000 - 15,000",
-                    "repair_cost_low": "Rs. 8,000 - 15,000",
-                    "repair_cost_high": "Rs. 8,000 - 15,000"
-                }
-            }), 200
-
-        new_price_range, repair_low, repair_high = price_data
-
-        if repairability == "Repairable":
-            repair_cost_range = repair_low
-        else:
-            repair_cost_range = repair_high
-
-        response_json = {
-            "status": "success",
-            "vehicle": vehicle,
-            "body_type": body_type,
-            "damage_type": damage_type,
-            "repairability": repairability,
-            "new_price_range": new_price_range,
-            "repair_cost_range": repair_cost_range,
-            "repair_cost_low": repair_cost_range,
-            "repair_cost_high": repair_cost_range
-        }
+        data = image.read()
+        if async_requested(request.args):
+            job_id = job_queue.submit('damage_detection', data, {
+                'filename': image.filename, 'vehicle': vehicle, 'body_type': body_type})
+            return jsonify(accepted(job_id)), 202
 
-        return jsonify(response_json)
+        return jsonify(inference_pool.run(_assess_damage, data, image.filename, vehicle, body_type))
 
     except Exception as e:
         print("Error in /damage_detection/upload:", e)
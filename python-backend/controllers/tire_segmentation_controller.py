@@ -1,7 +1,12 @@
 import os
 from flask import Blueprint, Flask, request, jsonify
 from werkzeug.utils import secure_filename
+from Config import Config
 from services import TireSegmentationService
+from services.image_pipeline import DecodedImage, persist_async
+from services.result_cache import result_cache
+from job_queue import accepted, async_requested, job_queue
+from inference_pool import inference_pool
 
 
 from services.damage_detection_service import DamageDetectionService
@@ -15,7 +20,7 @@ tire_segmentation = Blueprint('tire_segmentation', __name__)
 
 # Allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-UPLOAD_FOLDER = '/../uploads'  # Absolute path for your uploads folder
+UPLOAD_FOLDER = os.path.join(Config.UPLOAD_DIR, 'tires')
 
 
 # Helper function to check allowed file extensions
@@ -23,7 +28,35 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# Route for uploading tire segmentation images
+def _assess_tire(data, filename):
+    # Decoded once in memory (both models share it), and only on a cache miss
+    tire_segmentation_result = result_cache.get_or_compute(
+        'tire', data,
+        lambda: tire_segmentation_service.segment_tire(
+            DecodedImage(data, filename=filename, draft_size=256)),
+    )
+
+    # Predicted depth, tire condition and tread metrics
+    return {
+        "predicted_tire_depth_mm": tire_segmentation_result['predicted_tire_depth_mm'],
+        "tire_condition": tire_segmentation_result['tire_condition'],
+        "depth_by_threshold_mm": tire_segmentation_result['depth_by_threshold_mm'],
+        "tread_band_depths_mm": tire_segmentation_result['tread_band_depths_mm'],
+        "tread_band_stats_mm": tire_segmentation_result['tread_band_stats_mm']
+    }
+
+
+def _assess_tire_set(uploads):
+    # (data, filename) pairs, decoded where the models run
+    return tire_segmentation_service.segment_tires(
+        [DecodedImage(data, filename=filename, draft_size=256) for data, filename in uploads])
+
+
+job_queue.register('tire_segmentation', lambda payload, params: inference_pool.run(
+    _assess_tire, payload, params.get('filename')))
+
+
+# Route for uploading tire segmentation images (?async=1 queues a job instead)
 @tire_segmentation.route('/upload', methods=['POST'])
 def upload_tire_image():
     if 'image' not in request.files:
@@ -33,29 +66,20 @@ def upload_tire_image():
 
     # Check if file is valid and allowed
     if image and allowed_file(image.filename):
-        # Secure the filename and save the image
-        filename = secure_filename(image.filename)
-        folder_path = os.path.join(UPLOAD_FOLDER)
-
-        # Ensure the folder exists
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-
-        # Save the image to the designated folder
-        image_path = os.path.join(folder_path, filename)
-        image.save(image_path)
-
-        print(f"Image saved at: {image_path}")  # Debug print
-
         # Use the TireSegmentationService to predict the tire segmentation
         try:
-            tire_segmentation_result = tire_segmentation_service.segment_tire(image_path)
+            data = image.read()
 
-            # Return the results (both predicted depth and tire condition)
-            return jsonify({
-                "predicted_tire_depth_mm": tire_segmentation_result['predicted_tire_depth_mm'],
-                "tire_condition": tire_segmentation_result['tire_condition']
-            })
+            # Keep a copy of the original, written in the background
+            if Config.PERSIST_UPLOADS:
+                persist_async(os.path.join(UPLOAD_FOLDER, secure_filename(image.filename)), data)
+
+            if async_requested(request.args):
+                job_id = job_queue.submit('tire_segmentation', data, {'filename': image.filename})
+                return jsonify(accepted(job_id)), 202
+
+            # Return the results (predicted depth, tire condition and tread metrics)
+            return jsonify(inference_pool.run(_assess_tire, data, image.filename))
         except Exception as e:
             return jsonify({"error": f"Error processing image: {str(e)}"}), 500
 
@@ -63,6 +87,41 @@ def upload_tire_image():
         return jsonify({"error": "Invalid file format. Only PNG, JPG, JPEG, and GIF are allowed."}), 400
 
 
+# Route for assessing a full tire set (e.g. four tires plus the spare) in one request
+@tire_segmentation.route('/upload/batch', methods=['POST'])
+def upload_tire_images():
+    images = [image for image in request.files.getlist('images') if image and image.filename]
+    if not images:
+        return jsonify({"error": "No files uploaded"}), 400
+    if len(images) > Config.TIRE_BATCH_MAX_IMAGES:
+        return jsonify({"error": f"At most {Config.TIRE_BATCH_MAX_IMAGES} images per request"}), 400
+
+    invalid = [image.filename for image in images if not allowed_file(image.filename)]
+    if invalid:
+        return jsonify({
+            "error": "Invalid file format. Only PNG, JPG, JPEG, and GIF are allowed.",
+            "files": invalid
+        }), 400
+
+    # Optional labels such as front_left, one per image
+    positions = request.form.getlist('positions')
+
+    try:
+        uploads = [(image.read(), image.filename) for image in images]
+
+        if Config.PERSIST_UPLOADS:
+            for data, filename in uploads:
+                persist_async(os.path.join(UPLOAD_FOLDER, secure_filename(filename)), data)
+
+        result = inference_pool.run(_assess_tire_set, uploads)
+        for tire, position in zip(result['tires'], positions):
+            tire['position'] = position
+
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": f"Error processing images: {str(e)}"}), 500
+
+
 
     damage_detection = Blueprint('damage_detection', __name__)
 
@@ -1,17 +1,37 @@
 from flask import Blueprint, request, jsonify
 import os
 from werkzeug.utils import secure_filename
+from Config import Config
+from services.image_pipeline import DecodedImage, persist_async
+from services.result_cache import result_cache
+from job_queue import accepted, async_requested, job_queue
+from inference_pool import inference_pool
 from services.vehicle_classification_service import VehicleClassificationService
 
 vehicle_classification = Blueprint('vehicle_classification', __name__)
 vehicle_classification_service = VehicleClassificationService()
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads', 'vehicles')
+UPLOAD_FOLDER = os.path.join(Config.UPLOAD_DIR, 'vehicles')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _classify(data, filename):
+    return result_cache.get_or_compute(
+        'vehicle', data,
+        lambda: vehicle_classification_service.classify_vehicle(
+            DecodedImage(data, filename=filename, draft_size=224)),
+    )
+
+
+job_queue.register('vehicle_classification', lambda payload, params: {
+    "vehicle_type": inference_pool.run(_classify, payload, params.get('filename')),
+    "image_path": params.get('image_path'),
+})
+
+
+# ?async=1 queues a job and returns its id instead of waiting for the model
 @vehicle_classification.route('/upload', methods=['POST'])
 def upload_vehicle_image():
     if 'image' not in request.files:
@@ -20,14 +40,19 @@ def upload_vehicle_image():
     image = request.files['image']
 
     if image and allowed_file(image.filename):
-        filename = secure_filename(image.filename)
-        if not os.path.exists(UPLOAD_FOLDER):
-            os.makedirs(UPLOAD_FOLDER)
+        data = image.read()
 
-        image_path = os.path.join(UPLOAD_FOLDER, filename)
-        image.save(image_path)
+        image_path = None
+        if Config.PERSIST_UPLOADS:
+            image_path = os.path.join(UPLOAD_FOLDER, secure_filename(image.filename))
+            persist_async(image_path, data)
 
-        vehicle_type = vehicle_classification_service.classify_vehicle(image_path)
+        if async_requested(request.args):
+            job_id = job_queue.submit('vehicle_classification', data,
+                                      {'filename': image.filename, 'image_path': image_path})
+            return jsonify(accepted(job_id)), 202
+
+        vehicle_type = inference_pool.run(_classify, data, image.filename)
 
         return jsonify({
             "vehicle_type": vehicle_type,
@@ -37,6 +62,17 @@ def upload_vehicle_image():
         return jsonify({"error": "Invalid file format. Only PNG, JPG, JPEG, and GIF are allowed."}), 400
 
 
+def _price_features(data):
+    return {
+        'car_type': data.get('vehicle_type'),  # pass vehicle_type here for price model
+        'year': data.get('year'),
+        'color': data.get('color'),
+        'mileage': data.get('mileage'),
+        'owners': data.get('owners'),
+        'fuel_type': data.get('fuelType'),
+    }
+
+
 @vehicle_classification.route('/predict', methods=['POST'])
 def predict_price():
     data = request.get_json()
@@ -45,14 +81,7 @@ def predict_price():
     if not vehicle_type:
         return jsonify({'status': 'error', 'message': 'vehicle_type is required'}), 400
 
-    features = {
-        'car_type': vehicle_type,  # pass vehicle_type here for price model
-        'year': data.get('year'),
-        'color': data.get('color'),
-        'mileage': data.get('mileage'),
-        'owners': data.get('owners'),
-        'fuel_type': data.get('fuelType'),
-    }
+    features = _price_features(data)
 
     price = vehicle_classification_service.predict_price(features)
 
@@ -60,3 +89,29 @@ def predict_price():
         return jsonify({'status': 'error', 'message': 'Prediction failed'}), 500
 
     return jsonify({'status': 'success', 'predicted_price': price})
+
+
+# Bulk revaluation: a JSON array of listings (same fields as /predict), or
+# {"listings": [...]}, priced in one vectorized model call
+@vehicle_classification.route('/predict/batch', methods=['POST'])
+def predict_prices():
+    data = request.get_json(silent=True)
+    listings = data.get('listings') if isinstance(data, dict) else data
+    if not isinstance(listings, list) or not listings:
+        return jsonify({'status': 'error', 'message': 'A non-empty list of listings is required'}), 400
+    if len(listings) > Config.PRICE_BATCH_MAX_ITEMS:
+        return jsonify({'status': 'error',
+                        'message': f'At most {Config.PRICE_BATCH_MAX_ITEMS} listings per request'}), 400
+
+    invalid = [i for i, listing in enumerate(listings)
+               if not isinstance(listing, dict) or not listing.get('vehicle_type')]
+    if invalid:
+        return jsonify({'status': 'error', 'message': 'vehicle_type is required',
+                        'invalid_indices': invalid[:100]}), 400
+
+    prices = vehicle_classification_service.predict_prices([_price_features(listing) for listing in listings])
+
+    if prices is None:
+        return jsonify({'status': 'error', 'message': 'Prediction failed'}), 500
+
+    return jsonify({'status': 'success', 'count': len(prices), 'predicted_prices': prices})
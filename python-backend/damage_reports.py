@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+import os
+
+import data_access
+
+FILTER_COLUMNS = ('vehicle', 'body_type', 'damage_type', 'repairability')
+
+_COLUMNS = ('id', 'vehicle', 'body_type', 'damage_type', 'repairability', 'repair_cost', 'created_at',
+            'thumbnail_path')
+
+THUMBNAIL_URL = '/damage_reports/thumbnails/'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, report_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, report_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+    # Anything else would only fail later, when SQLite binds it
+    if not isinstance(created_at, str) or not data_access.is_int64(report_id):
+        raise InvalidCursor(cursor)
+    return created_at, report_id
+
+
+def _where(filters, extra=()):
+    clauses, params = list(extra), []
+    for column in FILTER_COLUMNS:
+        if filters.get(column):
+            clauses.append(f'{column} = ?')
+            params.append(filters[column])
+    return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def list_reports(filters, cursor=None, limit=50):
+    """
+    One page of reports, newest first, and the cursor for the next page
+    (None on the last page).
+
+    Pages are keyed on (created_at, id) rather than OFFSET, so every page
+    is a seek into idx_damage_reports_created (or the vehicle/part index
+    when those filters are set) no matter how deep the client has paged.
+    """
+    keyset = ()
+    params = []
+    if cursor:
+        keyset = ('(created_at, id) < (?, ?)',)
+        params = list(decode_cursor(cursor))
+    where, filter_params = _where(filters, keyset)
+
+    rows = data_access.query_all(f'''SELECT {', '.join(_COLUMNS)} FROM damage_reports
+                                     {where}
+                                     ORDER BY created_at DESC, id DESC
+                                     LIMIT ?''', params + filter_params + [limit + 1])
+
+    reports = [dict(zip(_COLUMNS, row)) for row in rows[:limit]]
+    for report in reports:
+        # List views get the small thumbnail, never the original upload
+        thumbnail_path = report.pop('thumbnail_path')
+        report['thumbnail_url'] = THUMBNAIL_URL + os.path.basename(thumbnail_path) if thumbnail_path else None
+    next_cursor = None
+    if len(rows) > limit:
+        last = reports[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return reports, next_cursor
+
+
+def aggregate_reports(filters):
+    """Report counts and repair-cost totals per (vehicle, part), computed in SQL."""
+    where, params = _where(filters)
+    rows = data_access.query_all(f'''SELECT vehicle, body_type, COUNT(*), SUM(repair_cost),
+                                            MIN(repair_cost), MAX(repair_cost)
+                                     FROM damage_reports
+                                     {where}
+                                     GROUP BY vehicle, body_type
+                                     ORDER BY vehicle, body_type''', params)
+    groups = [{
+        'vehicle': vehicle,
+        'body_type': body_type,
+        'count': count,
+        'repair_cost_total': total,
+        'repair_cost_avg': round(total / count, 2) if count and total is not None else None,
+        'repair_cost_min': low,
+        'repair_cost_max': high,
+    } for vehicle, body_type, count, total, low, high in rows]
+    return {
+        'groups': groups,
+        'total_count': sum(group['count'] for group in groups),
+        'total_repair_cost': sum(group['repair_cost_total'] or 0 for group in groups),
+    }
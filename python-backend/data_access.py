@@ -0,0 +1,100 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from Config import Config
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer, and synchronous=NORMAL only fsyncs at checkpoints in WAL mode.
+_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE_KB}',
+    f'PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}',
+    'PRAGMA temp_store=MEMORY',
+)
+
+# SQLite integers are signed 64-bit; binding a larger Python int raises OverflowError
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+_pool = queue.LifoQueue(maxsize=Config.SQLITE_POOL_SIZE)
+
+
+def is_int64(value):
+    """True for an int (not a bool) that SQLite can store as an INTEGER."""
+    return isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX
+
+
+def _connect():
+    conn = sqlite3.connect(
+        Config.DATABASE_PATH,
+        timeout=Config.SQLITE_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=Config.SQLITE_STATEMENT_CACHE,
+    )
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+@contextmanager
+def connection():
+    """
+    Borrows a pooled connection for the duration of the block.
+
+    Connections are opened once with the pragmas above and reused across
+    requests, so their prepared-statement cache stays warm.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+@contextmanager
+def transaction():
+    """Borrows a connection and commits on success (rolls back on error)."""
+    with connection() as conn:
+        with conn:
+            yield conn
+
+
+def query_one(sql, params=()):
+    with connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def query_all(sql, params=()):
+    with connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def execute(sql, params=()):
+    """Runs one write statement in its own transaction and returns the last row id."""
+    with transaction() as conn:
+        return conn.execute(sql, params).lastrowid
+
+
+def executemany(sql, seq_of_params):
+    with transaction() as conn:
+        conn.executemany(sql, seq_of_params)
+
+
+def _reset_pool():
+    # Connections must not be shared across fork(); the child opens its own
+    global _pool
+    _pool = queue.LifoQueue(maxsize=Config.SQLITE_POOL_SIZE)
+
+
+os.register_at_fork(after_in_child=_reset_pool)
@@ -0,0 +1,77 @@
+import heapq
+import math
+
+import data_access
+
+EARTH_RADIUS_KM = 6371.0088
+# Same sphere as the haversine distance, so the bounding box never clips a store inside the radius
+_KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# stores_rtree is an R*Tree over store coordinates, kept in sync with `stores`
+# by triggers (schema migration 2 in migrations.py)
+_NEARBY_CANDIDATES = '''
+    SELECT s.id, s.store_name, s.store_type, s.store_description, s.contact_number,
+           s.email, s.latitude, s.longitude
+    FROM stores_rtree r JOIN stores s ON s.id = r.id
+    WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+'''
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_boxes(lat, lon, radius_km):
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) boxes covering the circle,
+    split in two when it crosses the antimeridian.
+    """
+    dlat = radius_km / _KM_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if max_lat >= 90.0 or min_lat <= -90.0 or cos_lat < 1e-9:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    dlon = radius_km / (_KM_PER_DEGREE_LAT * cos_lat)
+    if dlon >= 180.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0:
+        return [(min_lat, max_lat, min_lon + 360.0, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360.0)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def nearby_stores(lat, lon, radius_km, limit):
+    """
+    Stores within `radius_km` of (lat, lon), nearest first.
+
+    The R*Tree narrows the search to the bounding box of the circle; exact
+    haversine distances are then computed only for those candidates.
+    """
+    results = []
+    with data_access.connection() as conn:
+        for box in bounding_boxes(lat, lon, radius_km):
+            for row in conn.execute(_NEARBY_CANDIDATES, box):
+                distance = haversine_km(lat, lon, row[6], row[7])
+                if distance <= radius_km:
+                    results.append((distance, row))
+
+    nearest = heapq.nsmallest(limit, results, key=lambda item: item[0])
+    return [{
+        'id': row[0],
+        'store_name': row[1],
+        'store_type': row[2],
+        'store_description': row[3],
+        'contact_number': row[4],
+        'email': row[5],
+        'latitude': row[6],
+        'longitude': row[7],
+        'distance_km': round(distance, 3),
+    } for distance, row in nearest]
@@ -1,53 +1,112 @@
 import numpy as np
-import pandas as pd
 import re
 import string
 import pickle
+from functools import lru_cache
 
-from nltk.stem import PorterStemmer
-ps = PorterStemmer()
+from services.model_registry import registry
 
-# load model
-with open('static/model/model.pickle', 'rb') as f:
-    model = pickle.load(f)
+# load model (on first prediction; nltk and scikit-learn are slow to import)
+def _load_model():
+    with open('static/model/model.pickle', 'rb') as f:
+        return pickle.load(f)
+
+def _load_stemmer():
+    from nltk.stem import PorterStemmer
+    return PorterStemmer()
+
+registry.register('sentiment', _load_model,
+                  warmup=lambda model: model.predict(np.zeros((1, len(tokens)), dtype=np.float32)))
+registry.register('porter_stemmer', _load_stemmer)
 
 # load stopwords
 with open('static/model/stopwords/english', 'r') as file:
     sw = file.read().splitlines()
 
 # load tokens
-vocab = pd.read_csv('static/model/vocabulary.txt', header=None)
-tokens = vocab[0].tolist()
+with open('static/model/vocabulary.txt', 'r', encoding='utf-8') as file:
+    tokens = file.read().splitlines()
+
+# Lookup tables built once so per-review work is a few dict/set hits
+_STOPWORDS = frozenset(sw)
+_TOKEN_INDEX = {token: i for i, token in enumerate(tokens)}
+_URL_TOKEN = re.compile(r'^https?:\/\/')
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+_DIGITS = re.compile(r'\d+')
+
+# Reviews reuse a small vocabulary, so stemming is memoized per word
+@lru_cache(maxsize=65536)
+def _stem(word):
+    return registry.get('porter_stemmer').stem(word)
 
 def remove_punctuations(text):
-    for punctuation in string.punctuation:
-        text = text.replace(punctuation, '')
-    return text
+    return text.translate(_PUNCTUATION_TABLE)
+
+def _normalize(text):
+    # lowercase and drop URL tokens, then strip punctuation and digits from the rest
+    text = " ".join(x for x in text.lower().split() if not _URL_TOKEN.match(x))
+    text = _DIGITS.sub('', remove_punctuations(text))
+    return " ".join(_stem(x) for x in text.split() if x not in _STOPWORDS)
 
 def preprocessing(text):
-    data = pd.DataFrame([text], columns=['feedback'])
-    data["feedback"] = data["feedback"].apply(lambda x: " ".join(x.lower() for x in x.split()))
-    data["feedback"] = data['feedback'].apply(lambda x: " ".join(re.sub(r'^https?:\/\/.*[\r\n]*', '', x, flags=re.MULTILINE) for x in x.split()))
-    data["feedback"] = data["feedback"].apply(remove_punctuations)
-    data["feedback"] = data['feedback'].str.replace('\d+', '', regex=True)
-    data["feedback"] = data["feedback"].apply(lambda x: " ".join(x for x in x.split() if x not in sw))
-    data["feedback"] = data["feedback"].apply(lambda x: " ".join(ps.stem(x) for x in x.split()))
-    return data["feedback"]
+    """
+    Normalizes one review or a list of reviews and returns a list of
+    processed strings, ready for `vectorizer`.
+    """
+    if isinstance(text, str):
+        text = [text]
+    return [_normalize(x) for x in text]
+
+def _token_indices(ds):
+    # (row, column) pairs of every vocabulary token present in each sentence
+    rows, cols = [], []
+    for row, sentence in enumerate(ds):
+        present = {_TOKEN_INDEX[x] for x in sentence.split() if x in _TOKEN_INDEX}
+        rows.extend([row] * len(present))
+        cols.extend(sorted(present))
+    return rows, cols
 
 def vectorizer(ds):
-    vectorized_lst = []
-    for sentence in ds:
-        sentence_lst = np.zeros(len(tokens))
-        for i in range(len(tokens)):
-            if tokens[i] in sentence.split():
-                sentence_lst[i] = 1  
-        vectorized_lst.append(sentence_lst)
-    vectorized_lst_new = np.asarray(vectorized_lst, dtype=np.float32)
-    return vectorized_lst_new
+    """
+    Encodes processed sentences as a float32 matrix with a 1 for every
+    vocabulary token present in the sentence.
+    """
+    ds = list(ds)
+    vectorized = np.zeros((len(ds), len(tokens)), dtype=np.float32)
+    rows, cols = _token_indices(ds)
+    vectorized[rows, cols] = 1
+    return vectorized
+
+def sparse_vectorizer(ds):
+    """Same encoding as `vectorizer`, returned as a scipy CSR matrix."""
+    from scipy.sparse import csr_matrix
+
+    ds = list(ds)
+    rows, cols = _token_indices(ds)
+    indptr = np.zeros(len(ds) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.asarray(rows, dtype=np.int64), minlength=len(ds)), out=indptr[1:])
+    data = np.ones(len(cols), dtype=np.float32)
+    return csr_matrix((data, np.asarray(cols, dtype=np.int32), indptr), shape=(len(ds), len(tokens)))
+
+def encode_reviews(reviews, sparse=False):
+    """Preprocesses and vectorizes a list of raw reviews in one call, e.g. for backfills."""
+    processed = preprocessing(reviews)
+    return sparse_vectorizer(processed) if sparse else vectorizer(processed)
 
 def get_prediction(vectorized_text):
-    prediction = model.predict(vectorized_text)
+    prediction = registry.get('sentiment').predict(vectorized_text)
     if prediction == 1:
         return 'negative'
     else:
-        return 'positive'
\ No newline at end of file
+        return 'positive'
+
+def get_predictions(vectorized_text):
+    """Batch counterpart of `get_prediction`: one label per row."""
+    if vectorized_text.shape[0] == 0:
+        return []
+    prediction = registry.get('sentiment').predict(vectorized_text)
+    return np.where(prediction == 1, 'negative', 'positive').tolist()
+
+def classify_reviews(reviews):
+    """Returns one 'positive'/'negative' label per raw review."""
+    return get_predictions(encode_reviews(reviews))
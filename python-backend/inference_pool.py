@@ -0,0 +1,259 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# A worker that dies sooner than this after starting waits this long before it
+# initializes its replacement, so a crash loop does not spin
+_RESPAWN_DELAY = 1.0
+
+
+def _stop_worker(signum, frame):
+    raise SystemExit(0)
+
+
+def _worker_main(conn, initializer, initargs, finalizer, delay):
+    signal.signal(signal.SIGTERM, _stop_worker)
+    # Ctrl-C reaches the whole process group; the master closes the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        time.sleep(delay)
+        if initializer is not None:
+            initializer(*initargs)
+        conn.send(('ready', os.getpid()))
+        while True:
+            try:
+                fn, args = conn.recv()
+            except EOFError:
+                break
+            try:
+                reply = (True, fn(*args))
+            except Exception as e:
+                reply = (False, e)
+            try:
+                conn.send(reply)
+            except Exception as e:
+                # The result or the exception does not pickle
+                conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+    except (SystemExit, BrokenPipeError):
+        # Stopped, or the master closed the pipe while this worker was starting
+        pass
+    finally:
+        # multiprocessing ends the worker with os._exit, which skips atexit
+        if finalizer is not None:
+            finalizer()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.started = time.monotonic()
+        self.ready = False
+        self.call = None          # Future of the call it is running
+        self.targeted = deque()   # calls for this worker only (see `gather`)
+
+
+class InferencePool:
+    """
+    Routes inference calls to a set of worker processes.
+
+    Until `start` is called (serve.py --mode dispatch does) `run` simply
+    calls the function in the current process, so the controllers behave
+    the same under `python app.py`. Once started, each call is queued for
+    the next idle one of N workers: the function must be importable at
+    module level, and its arguments and result are pickled (an upload is a
+    few hundred KB, small next to the inference itself).
+
+    Workers are forked by a 'forkserver' process, never by this one: the
+    server is started once, imports the `preload` modules and then only
+    forks. It runs no threads, so a replacement for a dead worker can be
+    forked at any time while this process keeps serving requests on its
+    threads. A worker that dies fails only the call it was running; the
+    dispatcher thread replaces it and the other workers carry on.
+    """
+
+    def __init__(self):
+        self._workers = []
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._context = None
+        self._initializer = None
+        self._initargs = ()
+        self._finalizer = None
+        self._wake_reader = self._wake_writer = None
+        self._thread = None
+        self._pid = None
+        self._closing = False
+
+    def start(self, workers, initializer=None, initargs=(), finalizer=None, preload=()):
+        """
+        Starts `workers` processes. Each calls `initializer(*initargs)` first
+        and `finalizer()` on its way out (to flush what it has queued); both
+        must be importable at module level.
+        """
+        self._context = multiprocessing.get_context('forkserver')
+        self._context.set_forkserver_preload(list(preload))
+        self._initializer, self._initargs, self._finalizer = initializer, initargs, finalizer
+        self._wake_reader, self._wake_writer = multiprocessing.Pipe(duplex=False)
+        self._workers = [self._spawn() for _ in range(workers)]
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True)
+        self._thread.start()
+
+    def enabled(self):
+        return self._thread is not None and self._pid == os.getpid()
+
+    def run(self, fn, *args):
+        if not self.enabled():
+            return fn(*args)
+        return self._submit(None, fn, args).result()
+
+    def gather(self, fn, timeout=None):
+        """
+        Runs `fn()` once in every worker and returns (pid, result) pairs; the
+        result is None for a worker that did not answer within `timeout`
+        seconds (busy with a long call, or still warming up).
+        """
+        if not self.enabled():
+            return [(os.getpid(), fn())]
+        with self._lock:
+            workers = list(self._workers)
+        futures = [self._submit(worker, fn, ()) for worker in workers]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for worker, future in zip(workers, futures):
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                results.append((worker.process.pid, future.result(remaining)))
+            except Exception:
+                results.append((worker.process.pid, None))
+        return results
+
+    def pids(self):
+        if not self.enabled():
+            return []
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+    def close(self, timeout=10.0):
+        """Lets the workers finish their call and exit, then fails whatever is still queued."""
+        if not self.enabled():
+            return
+        self._closing = True
+        self._wake()
+        self._thread.join(timeout)
+        with self._lock:
+            workers, self._workers = self._workers, []
+            pending, self._queue = list(self._queue), deque()
+        for worker in workers:
+            pending.extend(worker.targeted)
+            # End of input: the worker leaves its loop and exits
+            worker.conn.close()
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for future, _, _ in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError('Inference pool closed'))
+        self._thread = None
+
+    def _spawn(self, delay=0.0):
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, name='inference-worker', daemon=True,
+                                        args=(child_conn, self._initializer, self._initargs, self._finalizer,
+                                              delay))
+        process.start()
+        child_conn.close()
+        return _Worker(process, conn)
+
+    def _submit(self, worker, fn, args):
+        future = Future()
+        with self._lock:
+            (worker.targeted if worker is not None else self._queue).append((future, fn, args))
+        self._wake()
+        return future
+
+    def _wake(self):
+        with self._lock:
+            self._wake_writer.send_bytes(b'')
+
+    # The dispatcher thread: hands calls to idle workers, collects results and replaces dead workers
+
+    def _dispatch(self):
+        while not self._closing:
+            self._assign()
+            with self._lock:
+                workers = list(self._workers)
+            conns = {worker.conn: worker for worker in workers if worker.call is not None or not worker.ready}
+            sentinels = {worker.process.sentinel: worker for worker in workers}
+            ready = wait([self._wake_reader, *conns, *sentinels], timeout=1.0)
+            if self._wake_reader in ready:
+                while self._wake_reader.poll():
+                    self._wake_reader.recv_bytes()
+            for obj in ready:
+                if obj in conns:
+                    self._receive(conns[obj])
+            for obj in ready:
+                if obj in sentinels and not self._closing:
+                    self._replace(sentinels[obj])
+
+    def _assign(self):
+        assignments = []
+        with self._lock:
+            for worker in self._workers:
+                if not worker.ready or worker.call is not None:
+                    continue
+                while worker.targeted or self._queue:
+                    future, fn, args = (worker.targeted or self._queue).popleft()
+                    if future.set_running_or_notify_cancel():
+                        worker.call = future
+                        assignments.append((worker, fn, args))
+                        break
+        for worker, fn, args in assignments:
+            try:
+                worker.conn.send((fn, args))
+            except Exception as e:
+                # Arguments that do not pickle, or a worker that just died
+                future, worker.call = worker.call, None
+                future.set_exception(e)
+
+    def _receive(self, worker):
+        try:
+            message = worker.conn.recv()
+        except (EOFError, OSError):
+            # The worker died; its sentinel is handled by the caller
+            return
+        if not worker.ready:
+            worker.ready = True
+            return
+        future, worker.call = worker.call, None
+        ok, value = message
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _replace(self, worker):
+        process = worker.process
+        process.join(0)
+        print(f"Inference worker {process.pid} exited with code {process.exitcode}; starting a replacement")
+        if worker.call is not None:
+            worker.call.set_exception(RuntimeError(
+                f"Inference worker {process.pid} died (exit code {process.exitcode})"))
+            worker.call = None
+        worker.conn.close()
+        # The replacement does the waiting; this thread keeps serving the healthy workers
+        crashed_early = time.monotonic() - worker.started < _RESPAWN_DELAY
+        replacement = self._spawn(delay=_RESPAWN_DELAY if crashed_early else 0.0)
+        with self._lock:
+            replacement.targeted = worker.targeted
+            self._workers[self._workers.index(worker)] = replacement
+
+
+inference_pool = InferencePool()
@@ -0,0 +1,10 @@
+"""
+Imported once by the fork server of the inference pool (serve.py --mode
+dispatch): loads every module of the app and SERVE_PRELOAD_MODELS, so the
+workers it forks share them copy-on-write instead of loading them each.
+"""
+from Config import Config
+import app  # noqa: F401 (imports every controller and service)
+from services.model_registry import registry
+
+registry.warm_up(Config.SERVE_PRELOAD_MODELS, dummy_inference=False)
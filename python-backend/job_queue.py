@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import data_access
+from Config import Config
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed')
+
+_CLAIM = '''UPDATE jobs
+            SET state = 'running', attempts = attempts + 1, started_at = ?, worker = ?
+            WHERE id = (SELECT id FROM jobs
+                        WHERE state = 'queued' AND run_after <= ? AND attempts < max_attempts
+                        ORDER BY run_after, created_at
+                        LIMIT 1)
+            RETURNING id, kind, payload, params, attempts, max_attempts'''
+
+_JOB_COLUMNS = ('id', 'kind', 'state', 'attempts', 'max_attempts', 'result', 'error',
+                'created_at', 'started_at', 'finished_at')
+
+
+class JobQueue:
+    """
+    Durable queue for long-running inference, backed by the `jobs` table.
+
+    Handlers are registered per job kind and called as handler(payload,
+    params) -> JSON-serializable result; the uploaded bytes travel in the
+    row itself, so any worker process sharing the database can run a job.
+    Jobs are claimed with a single UPDATE ... RETURNING, so each is handed
+    to exactly one worker. A failing job is retried with exponential
+    backoff until max_attempts, and jobs left 'running' longer than
+    `stale_after` seconds (their worker died or hung) are queued again,
+    or failed if that was their last attempt.
+    """
+
+    def __init__(self, workers=2, max_attempts=3, retry_backoff=2.0, stale_after=300, retention=24 * 3600):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.stale_after = stale_after
+        self.retention = retention
+        self._handlers = {}
+        self._condition = threading.Condition()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._counters = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'retried': 0}
+        self._last_maintenance = 0.0
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def submit(self, kind, payload=None, params=None, max_attempts=None):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        data_access.execute('''INSERT INTO jobs (id, kind, state, payload, params, max_attempts, created_at, run_after)
+                               VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)''',
+                            (job_id, kind, payload, json.dumps(params or {}),
+                             max_attempts or self.max_attempts, now, now))
+        with self._lock:
+            self._counters['submitted'] += 1
+        self.start()
+        with self._condition:
+            self._condition.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        row = data_access.query_one(f'SELECT {", ".join(_JOB_COLUMNS)} FROM jobs WHERE id = ?', (job_id,))
+        if row is None:
+            return None
+        job = dict(zip(_JOB_COLUMNS, row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll: returns the job once it has finished, or as it is when
+        `timeout` runs out. Jobs finished in this process wake the waiter at
+        once; the database is re-checked every 250 ms for other processes.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['state'] in ('succeeded', 'failed') or remaining <= 0:
+                return job
+            with self._condition:
+                self._condition.wait(min(0.25, remaining))
+
+    def metrics(self):
+        now = time.time()
+        counts = dict(data_access.query_all('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+        oldest = data_access.query_one("SELECT MIN(created_at) FROM jobs WHERE state = 'queued'")[0]
+        recent = data_access.query_one('''SELECT AVG(finished_at - started_at), AVG(started_at - created_at)
+                                          FROM (SELECT finished_at, started_at, created_at FROM jobs
+                                                WHERE state = 'succeeded'
+                                                ORDER BY finished_at DESC LIMIT 100)''')
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'states': {state: counts.get(state, 0) for state in JOB_STATES},
+            'oldest_queued_seconds': round(now - oldest, 3) if oldest else None,
+            'avg_run_seconds': round(recent[0], 3) if recent[0] is not None else None,
+            'avg_wait_seconds': round(recent[1], 3) if recent[1] is not None else None,
+            'workers': self.workers,
+            'process': counters,
+        }
+
+    def start(self):
+        # Started lazily, and again in a forked child (threads do not survive fork)
+        if self._pid == os.getpid() or self.workers <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._condition = threading.Condition()
+            self._threads = [threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        worker = f'{os.getpid()}:{threading.current_thread().name}'
+        while True:
+            try:
+                self._maintain()
+                job = self._claim(worker)
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                job = None
+            if job is None:
+                with self._condition:
+                    self._condition.wait(1.0)
+                continue
+            self._execute(*job)
+
+    def _claim(self, worker):
+        now = time.time()
+        with data_access.transaction() as conn:
+            return conn.execute(_CLAIM, (now, worker, now)).fetchone()
+
+    def _execute(self, job_id, kind, payload, params, attempts, max_attempts):
+        try:
+            result = self._handlers[kind](payload, json.loads(params or '{}'))
+            data_access.execute('''UPDATE jobs SET state = 'succeeded', result = ?, error = NULL,
+                                   payload = NULL, finished_at = ? WHERE id = ?''',
+                                (json.dumps(result), time.time(), job_id))
+            outcome = 'succeeded'
+        except Exception as e:
+            if attempts < max_attempts:
+                run_after = time.time() + self.retry_backoff * 2 ** (attempts - 1)
+                data_access.execute('''UPDATE jobs SET state = 'queued', error = ?, run_after = ?
+                                       WHERE id = ?''', (str(e), run_after, job_id))
+                outcome = 'retried'
+            else:
+                data_access.execute('''UPDATE jobs SET state = 'failed', error = ?, payload = NULL,
+                                       finished_at = ? WHERE id = ?''', (str(e), time.time(), job_id))
+                outcome = 'failed'
+            print(f"Job {job_id} ({kind}) attempt {attempts}/{max_attempts} failed: {e}")
+        with self._lock:
+            self._counters[outcome] += 1
+        with self._condition:
+            self._condition.notify_all()
+
+    def _maintain(self):
+        # Once a minute: requeue jobs orphaned by a dead worker (or fail them once
+        # they have used up their attempts), drop old finished jobs
+        now = time.time()
+        with self._lock:
+            if now - self._last_maintenance < 60:
+                return
+            self._last_maintenance = now
+        stale = now - self.stale_after
+        with data_access.transaction() as conn:
+            conn.execute('''UPDATE jobs SET state = 'failed', payload = NULL, finished_at = ?,
+                                   error = 'Worker did not finish the job within ' || ? || ' seconds'
+                            WHERE state = 'running' AND started_at < ? AND attempts >= max_attempts''',
+                         (now, int(self.stale_after), stale))
+            conn.execute('''UPDATE jobs SET state = 'queued', run_after = ?
+                            WHERE state = 'running' AND started_at < ? AND attempts < max_attempts''',
+                         (now, stale))
+            conn.execute('''DELETE FROM jobs WHERE state IN ('succeeded', 'failed') AND finished_at < ?''',
+                         (now - self.retention,))
+
+
+job_queue = JobQueue(
+    workers=Config.JOB_WORKERS,
+    max_attempts=Config.JOB_MAX_ATTEMPTS,
+    stale_after=Config.JOB_STALE_AFTER,
+    retention=Config.JOB_RETENTION,
+)
+
+
+def async_requested(args):
+    return args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def accepted(job_id):
+    """Body of the 202 response returned for ?async=1 uploads."""
+    return {'job_id': job_id, 'state': 'queued', 'status_url': f'/jobs/{job_id}'}
@@ -0,0 +1,140 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import data_access
+from Config import Config
+
+_INSERT_LOGS = '''INSERT INTO logs (timestamp, level, message, user_email, endpoint)
+                  VALUES (?, ?, ?, ?, ?)'''
+
+_STOP = object()
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class LogSink:
+    """
+    Buffers rows for the `logs` table and writes them from a background thread.
+
+    Rows are flushed as one multi-row transaction once `batch_size` rows are
+    queued or `flush_interval` seconds have passed, so request handlers never
+    wait on a commit. When the queue is full, `policy` decides what happens:
+    'block' waits up to `block_timeout` seconds for room, 'drop_newest'
+    discards the new row and 'drop_oldest' discards the oldest queued row.
+    """
+
+    POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=1.0,
+                 policy='drop_newest', block_timeout=0.5):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def log(self, level, message, user_email=None, endpoint=None):
+        # Stamp the row now; the insert may happen up to flush_interval later
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        # Text now: one value SQLite cannot bind (an exception, a dict) would fail the whole batch
+        self._put((timestamp, str(level), str(message), _text(user_email), _text(endpoint)))
+
+    def close(self, timeout=5.0):
+        """Flushes everything queued so far and stops the writer thread."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _put(self, row):
+        self._ensure_started()
+        try:
+            if self.policy == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            return
+        except queue.Full:
+            pass
+
+        if self.policy == 'drop_oldest':
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(row)
+            except (queue.Empty, queue.Full):
+                pass
+        with self._lock:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked child (threads do not survive fork)
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='log-sink', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                self._write(batch)
+                return
+            if row is not None:
+                batch.append(row)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    @staticmethod
+    def _write(batch):
+        if not batch:
+            return
+        try:
+            data_access.executemany(_INSERT_LOGS, batch)
+            return
+        except sqlite3.IntegrityError:
+            # A row breaking a constraint (no endpoint) rolls back the batch: write the others one by one
+            pass
+        except sqlite3.Error as e:
+            print(f"Error logging to database: {e}")
+            return
+        for row in batch:
+            try:
+                data_access.execute(_INSERT_LOGS, row)
+            except sqlite3.Error as e:
+                print(f"Error logging to database: {e}")
+
+
+log_sink = LogSink(
+    max_queue=Config.LOG_QUEUE_SIZE,
+    batch_size=Config.LOG_BATCH_SIZE,
+    flush_interval=Config.LOG_FLUSH_INTERVAL,
+    policy=Config.LOG_QUEUE_POLICY,
+)
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from Config import Config
+
+_YEAR_COLUMN = re.compile(r'^year_(\d{4})$')
+
+
+class _Snapshot:
+    def __init__(self, years, entries, etag):
+        self.years = years
+        self.entries = entries
+        self.etag = etag
+        self.by_type = {}
+        for vehicle_type, model_year in sorted(entries):
+            self.by_type.setdefault(vehicle_type, []).append(model_year)
+
+
+class MarketTrends:
+    """
+    In-memory copy of `vehicle_market_analysis`, keyed by (vehicle_type, model_year).
+
+    Derived series are computed once per load for every row together: the
+    year-over-year change (%), the least-squares price slope per year
+    (negative when the vehicle depreciates) and a linear forecast for the
+    year after the last column.
+
+    `PRAGMA data_version` on a private connection tells whether anything
+    wrote to the database since the last check (checked at most every
+    `check_interval` seconds). The table is then re-read, and the ETag only
+    changes when its rows actually did, so unrelated writes such as logs do
+    not invalidate clients' cached responses.
+    """
+
+    def __init__(self, database_path, check_interval=2.0):
+        self.database_path = database_path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._data_version = None
+        self._checked = 0.0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self, vehicle_type, model_year):
+        return self.snapshot().entries.get((vehicle_type, model_year))
+
+    def for_vehicle_type(self, vehicle_type):
+        """Every model year of one vehicle type, oldest first."""
+        snapshot = self.snapshot()
+        return {model_year: snapshot.entries[(vehicle_type, model_year)]
+                for model_year in snapshot.by_type.get(vehicle_type, [])}
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._checked >= self.check_interval:
+                self._refresh()
+            return self._snapshot
+
+    def _connection(self):
+        # Private, never pooled: data_version only reflects other connections' writes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.database_path, timeout=Config.SQLITE_BUSY_TIMEOUT,
+                                         check_same_thread=False)
+            self._pid = os.getpid()
+            self._data_version = None
+        return self._conn
+
+    def _refresh(self):
+        conn = self._connection()
+        self._checked = time.monotonic()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if self._snapshot is not None and data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        try:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(vehicle_market_analysis)')]
+            years = sorted(int(m.group(1)) for m in map(_YEAR_COLUMN.match, columns) if m)
+            rows = conn.execute(
+                'SELECT vehicle_type, model_year, '
+                + ', '.join(f'year_{year}' for year in years)
+                + ' FROM vehicle_market_analysis ORDER BY rowid').fetchall() if years else []
+        except sqlite3.Error as e:
+            print(f"Error loading vehicle market analysis: {e}")
+            years, rows = [], []
+
+        etag = hashlib.sha1(repr((years, rows)).encode()).hexdigest()[:20]
+        if self._snapshot is not None and etag == self._snapshot.etag:
+            return
+        self._snapshot = _Snapshot(years, self._build_entries(years, rows), etag)
+
+    @staticmethod
+    def _build_entries(years, rows):
+        entries = {}
+        if not rows:
+            return entries
+
+        prices = np.array([row[2:] for row in rows], dtype=np.float64)  # NULL -> nan
+        x = np.array(years, dtype=np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yoy = (prices[:, 1:] - prices[:, :-1]) / prices[:, :-1] * 100
+
+        # Least-squares line per row over its known prices
+        known = ~np.isnan(prices)
+        n = known.sum(axis=1)
+        xs = np.where(known, x, 0.0)
+        ys = np.where(known, prices, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_mean = xs.sum(axis=1) / n
+            y_mean = ys.sum(axis=1) / n
+            dx = np.where(known, x - x_mean[:, None], 0.0)
+            slope = (dx * (ys - y_mean[:, None])).sum(axis=1) / (dx ** 2).sum(axis=1)
+        next_year = years[-1] + 1
+        forecast = y_mean + slope * (next_year - x_mean)
+
+        def number(value, digits=None):
+            if not np.isfinite(value):
+                return None
+            return round(float(value), digits) if digits else int(round(value))
+
+        for i, row in enumerate(rows):
+            key = (row[0], row[1])
+            if key in entries:
+                continue  # keep the first row for a key, as the old query did
+            entries[key] = {
+                'data': {str(year): value for year, value in zip(years, row[2:])},
+                'yoy_change_pct': {str(year): number(change, 2) for year, change in zip(years[1:], yoy[i])},
+                'slope_per_year': number(slope[i], 2),
+                'forecast': {str(next_year): number(forecast[i])},
+            }
+        return entries
+
+
+market_trends = MarketTrends(Config.DATABASE_PATH, check_interval=Config.MARKET_TRENDS_CHECK_INTERVAL)
@@ -0,0 +1,241 @@
+import sqlite3
+
+# Base tables, as init_db used to create them (plus vehicle_market_analysis,
+# which the hot-path indexes below need on a fresh database)
+_BASE_TABLES = (
+    # Stores table
+    '''CREATE TABLE IF NOT EXISTS stores
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_name TEXT NOT NULL,
+        store_type TEXT NOT NULL,
+        store_description TEXT,
+        contact_number TEXT NOT NULL,
+        email TEXT NOT NULL,
+        password TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL)''',
+
+    # Logs table
+    '''CREATE TABLE IF NOT EXISTS logs
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        level TEXT NOT NULL,
+        message TEXT NOT NULL,
+        user_email TEXT,
+        endpoint TEXT NOT NULL)''',
+
+    # Products table
+    '''CREATE TABLE IF NOT EXISTS products
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        stock BOOLEAN NOT NULL,
+        FOREIGN KEY (store_id) REFERENCES stores (id))''',
+
+    # Vehicle repair costs table
+    '''CREATE TABLE IF NOT EXISTS repair_costs
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle TEXT NOT NULL,
+        part TEXT NOT NULL,
+        new_price_low INTEGER NOT NULL,
+        new_price_high INTEGER NOT NULL,
+        repair_value_low INTEGER NOT NULL,
+        repair_value_high INTEGER NOT NULL,
+        UNIQUE(vehicle, part))''',
+
+    # Damage reports table
+    '''CREATE TABLE IF NOT EXISTS damage_reports
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle TEXT NOT NULL,
+        body_type TEXT NOT NULL,
+        damage_type TEXT NOT NULL,
+        repairability TEXT NOT NULL,
+        repair_cost INTEGER NOT NULL,
+        image_path TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+
+    # Store feedback table
+    '''CREATE TABLE IF NOT EXISTS feedback
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id INTEGER NOT NULL,
+        comment TEXT NOT NULL,
+        sentiment TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (store_id) REFERENCES stores(id))''',
+
+    # Sentiment counters shared by all worker processes
+    '''CREATE TABLE IF NOT EXISTS sentiment_counters
+       (label TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0)''',
+
+    # Market analysis; shipped pre-filled in stores.db
+    '''CREATE TABLE IF NOT EXISTS vehicle_market_analysis
+       (vehicle_type TEXT,
+        model_year INTEGER,
+        year_2020 INTEGER,
+        year_2021 INTEGER,
+        year_2022 INTEGER,
+        year_2023 INTEGER,
+        year_2024 INTEGER)''',
+)
+
+
+# Migration 2 is frozen here as literal SQL: the query modules (geo.py,
+# product_search.py) may change, a shipped migration must not.
+
+# R*Tree index over store coordinates, kept in sync with `stores` by triggers
+# so every insert path (/register in app.py and in store_routes) is covered.
+_STORE_RTREE = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS stores_rtree
+       USING rtree(id, min_lat, max_lat, min_lon, max_lon)''',
+    '''CREATE TRIGGER IF NOT EXISTS stores_rtree_insert AFTER INSERT ON stores
+       BEGIN
+           INSERT OR REPLACE INTO stores_rtree
+           VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS stores_rtree_update AFTER UPDATE OF latitude, longitude ON stores
+       BEGIN
+           INSERT OR REPLACE INTO stores_rtree
+           VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS stores_rtree_delete AFTER DELETE ON stores
+       BEGIN
+           DELETE FROM stores_rtree WHERE id = old.id;
+       END''',
+    # Backfill stores that existed before the index did
+    '''INSERT INTO stores_rtree
+       SELECT id, latitude, latitude, longitude, longitude FROM stores
+       WHERE id NOT IN (SELECT id FROM stores_rtree)''',
+)
+
+# FTS5 index over product names. It is an external-content table, so the
+# text lives only in `products`; triggers keep the index in step with every
+# insert path (/store/<id>/add-product in app.py and in store_routes).
+_PRODUCT_FTS = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+       USING fts5(name, content='products', content_rowid='id',
+                  tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab
+       USING fts5vocab(products_fts, 'row')''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+       BEGIN
+           INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+       BEGIN
+           INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name ON products
+       BEGIN
+           INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+           INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+       END''',
+    # Build the index for products that existed before it did
+    '''INSERT INTO products_fts (products_fts)
+       SELECT 'rebuild'
+       WHERE (SELECT COUNT(*) FROM products_fts_docsize) != (SELECT COUNT(*) FROM products)''',
+)
+
+# Hot-path indexes, named after the query each one serves. repair_costs needs
+# none: its UNIQUE(vehicle, part) index already answers the lookup in one seek
+# (the planner keeps using it even when a covering index exists).
+_HOT_PATH_INDEXES = (
+    # /damage_reports: newest first, and keyset pages on (created_at, id)
+    'CREATE INDEX IF NOT EXISTS idx_damage_reports_created ON damage_reports (created_at, id)',
+    # Log retention and inspection by time, and per-endpoint history
+    'CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_logs_endpoint_timestamp ON logs (endpoint, timestamp)',
+    # /vehicle_price_trends lookups by (vehicle_type, model_year)
+    '''CREATE INDEX IF NOT EXISTS idx_vehicle_market_analysis_key
+       ON vehicle_market_analysis (vehicle_type, model_year)''',
+    # /login
+    'CREATE INDEX IF NOT EXISTS idx_stores_email ON stores (email)',
+    # One index for both /predict/batch?store_id keyset reads (store_id = ?
+    # AND id > ? ORDER BY id) and the per-store sentiment rollup, which it covers
+    'CREATE INDEX IF NOT EXISTS idx_feedback_store_id_sentiment ON feedback (store_id, id, sentiment)',
+    # Products of one store
+    'CREATE INDEX IF NOT EXISTS idx_products_store ON products (store_id)',
+    # Give the planner statistics for the new indexes
+    'ANALYZE',
+)
+
+# /damage_reports keyset pages filtered by vehicle (and part), and the
+# per-(vehicle, part) aggregate, which this index covers
+_DAMAGE_REPORT_INDEXES = (
+    '''CREATE INDEX IF NOT EXISTS idx_damage_reports_vehicle_part_created
+       ON damage_reports (vehicle, body_type, created_at, id)''',
+    '''CREATE INDEX IF NOT EXISTS idx_damage_reports_vehicle_part_cost
+       ON damage_reports (vehicle, body_type, repair_cost)''',
+)
+
+# Durable queue for ?async=1 inference requests (job_queue.py)
+_JOB_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS jobs
+       (id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        state TEXT NOT NULL,
+        payload BLOB,
+        params TEXT,
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        worker TEXT,
+        created_at REAL NOT NULL,
+        run_after REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL)''',
+    # Claiming the next runnable job, and per-state metrics
+    'CREATE INDEX IF NOT EXISTS idx_jobs_state_run_after ON jobs (state, run_after, created_at)',
+)
+
+# (version, description, steps). A step is an SQL string or a callable taking
+# the connection. Append new migrations; never edit one that has shipped.
+MIGRATIONS = (
+    (1, 'base tables', _BASE_TABLES),
+    (2, 'spatial index over stores and full-text index over products', _STORE_RTREE + _PRODUCT_FTS),
+    (3, 'indexes for hot lookups', _HOT_PATH_INDEXES),
+    (4, 'damage report filter and aggregate indexes', _DAMAGE_REPORT_INDEXES),
+    (5, 'damage report thumbnails', ('ALTER TABLE damage_reports ADD COLUMN thumbnail_path TEXT',)),
+    (6, 'inference job queue', _JOB_TABLES),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """
+    Applies every migration newer than the database's `PRAGMA user_version`,
+    up to `target`, and returns the resulting version.
+
+    Each migration runs in its own IMMEDIATE transaction together with the
+    version bump, so a failed migration leaves no partial schema behind and
+    workers starting at the same time apply it only once.
+    """
+    for version, description, steps in MIGRATIONS:
+        if version > target:
+            break
+        if schema_version(conn) >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+            print(f"Applied schema migration {version}: {description}")
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return schema_version(conn)
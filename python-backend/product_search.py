@@ -0,0 +1,121 @@
+import difflib
+import heapq
+import re
+
+import data_access
+from geo import bounding_boxes, haversine_km
+
+# products_fts is an external-content FTS5 index over product names, kept in
+# step with `products` by triggers (schema migration 2 in migrations.py)
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+_SEARCH = '''
+    SELECT p.id, p.name, p.price, p.stock, s.id, s.store_name, s.contact_number,
+           s.latitude, s.longitude, products_fts.rank
+    FROM products_fts
+    JOIN products p ON p.id = products_fts.rowid
+    JOIN stores s ON s.id = p.store_id
+    {geo_join}
+    WHERE products_fts MATCH ? {filters}
+    ORDER BY products_fts.rank
+'''
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _similar_terms(conn, word):
+    # Index terms are porter stems, so compare against terms sharing the first letter
+    terms = [row[0] for row in conn.execute(
+        'SELECT term FROM products_fts_vocab WHERE term >= ? AND term < ?',
+        (word[0], word[0] + '\uffff'))]
+    return difflib.get_close_matches(word, terms, n=3, cutoff=0.75)
+
+
+def build_match_query(conn, words, fuzzy):
+    """
+    Every word must match, as a prefix. With `fuzzy`, each word also accepts
+    the closest index terms, so small typos ("brak pds") still find rows.
+    """
+    groups = []
+    for word in words:
+        options = [_quote(word) + '*']
+        if fuzzy:
+            options += [_quote(term) for term in _similar_terms(conn, word) if term != word]
+        groups.append(options[0] if len(options) == 1 else '(' + ' OR '.join(options) + ')')
+    return ' AND '.join(groups)
+
+
+def search_products(query, in_stock=False, min_price=None, max_price=None,
+                    lat=None, lon=None, radius_km=None, limit=20, fuzzy=None):
+    """
+    Ranked spare-part search. Results are ordered by bm25 relevance, or by
+    distance when a location and radius are given ("part X near me").
+
+    `fuzzy=None` retries with typo-tolerant matching only when the exact
+    prefix search finds nothing.
+    """
+    words = [word.lower() for word in _WORD.findall(query or '')]
+    if not words:
+        return []
+
+    filters, params = [], []
+    if in_stock:
+        filters.append('AND p.stock = 1')
+    if min_price is not None:
+        filters.append('AND CAST(p.price AS REAL) >= ?')
+        params.append(min_price)
+    if max_price is not None:
+        filters.append('AND CAST(p.price AS REAL) <= ?')
+        params.append(max_price)
+
+    near = lat is not None and lon is not None and radius_km is not None
+    geo_join = ''
+    if near:
+        boxes = bounding_boxes(lat, lon, radius_km)
+        geo_join = 'JOIN stores_rtree r ON r.id = s.id'
+        filters.append('AND (' + ' OR '.join(
+            '(r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?)' for _ in boxes) + ')')
+        params.extend(value for box in boxes for value in box)
+
+    sql = _SEARCH.format(geo_join=geo_join, filters=' '.join(filters))
+    if not near:
+        sql += ' LIMIT ?'
+
+    with data_access.connection() as conn:
+        rows, tried = [], set()
+        for use_fuzzy in ([fuzzy] if fuzzy is not None else [False, True]):
+            match = build_match_query(conn, words, use_fuzzy)
+            if match in tried:
+                break
+            tried.add(match)
+            rows = conn.execute(sql, [match] + params + ([] if near else [limit])).fetchall()
+            if rows:
+                break
+
+    results = []
+    for row in rows:
+        result = {
+            'id': row[0],
+            'name': row[1],
+            'price': row[2],
+            'stock': bool(row[3]),
+            'store': {
+                'id': row[4],
+                'store_name': row[5],
+                'contact_number': row[6],
+                'latitude': row[7],
+                'longitude': row[8],
+            },
+            'score': round(-row[9], 4),
+        }
+        if near:
+            result['distance_km'] = round(haversine_km(lat, lon, row[7], row[8]), 3)
+            if result['distance_km'] > radius_km:
+                continue
+        results.append(result)
+
+    if near:
+        results = heapq.nsmallest(limit, results, key=lambda r: (r['distance_km'], -r['score']))
+    return results
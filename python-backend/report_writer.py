@@ -0,0 +1,157 @@
+import atexit
+import hashlib
+import io
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+from PIL import Image
+
+import data_access
+from Config import BASE_DIR, Config
+from services.image_pipeline import write_file
+
+_INSERT_REPORT = '''INSERT INTO damage_reports
+                    (vehicle, body_type, damage_type, repairability, repair_cost, image_path, thumbnail_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+_NUMBER = re.compile(r'\d[\d,]*')
+
+_STOP = object()
+
+
+def estimate_repair_cost(cost_range):
+    """Midpoint of a range such as "Rs. 8,000 - 15,000" (0 if it has no numbers)."""
+    values = [int(number.replace(',', '')) for number in _NUMBER.findall(cost_range or '')]
+    return sum(values) // len(values) if values else 0
+
+
+class ReportWriter:
+    """
+    Persists damage reports off the request path.
+
+    For each submitted report the background thread stores the original
+    upload under a content-addressed path (originals/<sha[:2]>/<sha>.<ext>),
+    renders a small JPEG thumbnail (thumbnails/<sha>.jpg) for list views,
+    and inserts the `damage_reports` row. Reports queued together are
+    inserted in one transaction. Identical photos share both files.
+
+    The queue holds the uploads themselves, so it is bounded both by count
+    and by `max_queue_bytes`. A report that does not fit is dropped (and
+    counted in `dropped`) rather than making the request wait.
+    """
+
+    def __init__(self, upload_dir, thumbnail_size=256, max_queue=1000, max_queue_bytes=256 * 1024 * 1024,
+                 batch_size=50):
+        self.upload_dir = upload_dir
+        self.thumbnail_size = thumbnail_size
+        self.max_queue_bytes = max_queue_bytes
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queued_bytes = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def submit(self, data, vehicle, body_type, damage_type, repairability, repair_cost):
+        """Queues a report and returns the content hash that names its image."""
+        digest = hashlib.sha256(data).hexdigest()
+        self._ensure_started()
+        with self._lock:
+            queued = self._queued_bytes + len(data) <= self.max_queue_bytes
+            if queued:
+                try:
+                    self._queue.put_nowait((digest, data, vehicle, body_type, damage_type, repairability,
+                                            repair_cost))
+                    self._queued_bytes += len(data)
+                except queue.Full:
+                    queued = False
+            if not queued:
+                self.dropped += 1
+        if not queued:
+            print(f"Report queue full; dropped damage report for image {digest}")
+        return digest
+
+    def thumbnail_dir(self):
+        return os.path.join(self.upload_dir, 'thumbnails')
+
+    def close(self, timeout=10.0):
+        """Writes everything queued so far and stops the writer thread."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked child (threads do not survive fork)
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._queued_bytes = 0
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='report-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while items[-1] is not _STOP and len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = items[-1] is _STOP
+            reports = [item for item in items if item is not _STOP]
+            rows = [row for row in map(self._store_files, reports) if row]
+            with self._lock:
+                self._queued_bytes -= sum(len(report[1]) for report in reports)
+            if rows:
+                try:
+                    data_access.executemany(_INSERT_REPORT, rows)
+                except sqlite3.Error as e:
+                    print(f"Error saving damage reports: {e}")
+            if stop:
+                return
+
+    def _store_files(self, item):
+        digest, data, vehicle, body_type, damage_type, repairability, repair_cost = item
+        try:
+            image = Image.open(io.BytesIO(data))
+            extension = _EXTENSIONS.get(image.format, 'bin')
+            original = os.path.join(self.upload_dir, 'originals', digest[:2], f"{digest}.{extension}")
+            thumbnail = os.path.join(self.thumbnail_dir(), f"{digest}.jpg")
+
+            if not os.path.exists(original):
+                write_file(original, data)
+            if not os.path.exists(thumbnail):
+                if image.format == 'JPEG':
+                    image.draft('RGB', (self.thumbnail_size, self.thumbnail_size))
+                image = image.convert('RGB')
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                buffer = io.BytesIO()
+                image.save(buffer, 'JPEG', quality=80, optimize=True)
+                write_file(thumbnail, buffer.getvalue())
+        except (OSError, ValueError) as e:
+            print(f"Error storing image for damage report {digest}: {e}")
+            return None
+
+        return (vehicle, body_type, damage_type, repairability, repair_cost,
+                os.path.relpath(original, BASE_DIR), os.path.relpath(thumbnail, BASE_DIR))
+
+
+report_writer = ReportWriter(
+    upload_dir=os.path.join(Config.UPLOAD_DIR, 'damage'),
+    thumbnail_size=Config.REPORT_THUMBNAIL_SIZE,
+    max_queue=Config.REPORT_QUEUE_SIZE,
+    max_queue_bytes=Config.REPORT_QUEUE_BYTES,
+)
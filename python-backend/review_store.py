@@ -0,0 +1,123 @@
+import atexit
+import sqlite3
+import threading
+from collections import Counter, deque
+
+import data_access
+
+LABELS = ('positive', 'negative')
+
+# Python types sqlite3 binds as parameters (ints only within 64 bits)
+_BINDABLE = (int, float, str, bytes, type(None))
+
+
+def _bindable(value):
+    if isinstance(value, int):
+        return data_access.INT64_MIN <= value <= data_access.INT64_MAX
+    return isinstance(value, _BINDABLE)
+
+
+class ReviewAggregator:
+    """
+    Bounded, thread-safe store for sentiment results.
+
+    Recent reviews live in a fixed-size ring buffer (O(1) insert, bounded
+    memory). Counter increments are kept as local deltas and periodically
+    added to the `sentiment_counters` table with `count = count + ?`, so any
+    number of worker processes can share the same totals without losing
+    updates. Reviews tagged with a store id are batched into the `feedback`
+    table on the same flush, which is what the per-store rollups read from.
+
+    The ring buffer is per process; counts are global and lag other
+    processes by at most one flush interval.
+    """
+
+    def __init__(self, capacity=100, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._recent = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._pending_feedback = []
+        # Deltas taken by a flush that is still writing them
+        self._inflight = Counter()
+        self._inflight_feedback = []
+        self._totals = Counter()
+        self._stop = threading.Event()
+
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name='review-aggregator', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, text, prediction, store_id=None):
+        with self._lock:
+            self._recent.appendleft({"text": text, "prediction": prediction})
+            self._pending[prediction] += 1
+            if store_id is not None:
+                self._pending_feedback.append((store_id, text, prediction))
+
+    def snapshot(self, limit=5):
+        """Returns global counts plus the `limit` most recent reviews seen by this process."""
+        with self._lock:
+            counts = self._totals + self._inflight + self._pending
+            recent = [self._recent[i] for i in range(min(limit, len(self._recent)))]
+        return {
+            "positive_count": counts['positive'],
+            "negative_count": counts['negative'],
+            "recent_reviews": recent,
+        }
+
+    def store_summary(self, store_id):
+        """Sentiment rollup for one store, including reviews not flushed yet."""
+        rows = data_access.query_all('''SELECT sentiment, COUNT(*) FROM feedback
+                                        WHERE store_id = ? GROUP BY sentiment''', (store_id,))
+        counts = Counter(dict(rows))
+        with self._lock:
+            unflushed = self._inflight_feedback + self._pending_feedback
+            counts.update(sentiment for sid, _, sentiment in unflushed if sid == store_id)
+        return {label: counts[label] for label in LABELS}
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                self._inflight, self._pending = self._pending, Counter()
+                self._inflight_feedback, self._pending_feedback = self._pending_feedback, []
+                counts, feedback = list(self._inflight.items()), self._inflight_feedback
+
+            # A row SQLite cannot bind would fail every later flush too: drop it
+            bindable = [row for row in feedback if all(map(_bindable, row))]
+            if len(bindable) != len(feedback):
+                print(f"Dropped {len(feedback) - len(bindable)} feedback rows with unsupported values")
+                with self._lock:
+                    self._inflight_feedback = feedback = bindable
+
+            try:
+                with data_access.transaction() as conn:
+                    conn.executemany('''INSERT INTO sentiment_counters (label, count) VALUES (?, ?)
+                                        ON CONFLICT(label) DO UPDATE SET count = count + excluded.count''',
+                                     counts)
+                    conn.executemany('''INSERT INTO feedback (store_id, comment, sentiment)
+                                        VALUES (?, ?, ?)''', feedback)
+                totals = Counter(dict(data_access.query_all('SELECT label, count FROM sentiment_counters')))
+            except (sqlite3.Error, OverflowError) as e:
+                # Never let a bad row end the flush thread; the deltas stay pending for the next flush
+                print(f"Error flushing review counters: {e}")
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    self._pending.update(self._inflight)
+                    self._pending_feedback[:0] = self._inflight_feedback
+                    self._inflight, self._inflight_feedback = Counter(), []
+                return
+
+            with self._lock:
+                self._totals = totals
+                self._inflight, self._inflight_feedback = Counter(), []
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
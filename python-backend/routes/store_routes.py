@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 import sqlite3
+import data_access
+from log_sink import log_sink
 from werkzeug.security import generate_password_hash
 
 # Create a Blueprint for store-related routes
@@ -8,24 +10,15 @@ store_bp = Blueprint('store', __name__)
 # Helper function to log messages to the database
 def log_to_db(level, message, user_email=None, endpoint=None):
     """
-    Logs a message to the 'logs' table in the database.
+    Queues a message for the 'logs' table in the database. Rows are written
+    in batches by a background thread, so this never waits on a commit.
     
     :param level: Log level (e.g., 'INFO', 'ERROR').
     :param message: Log message.
     :param user_email: Email of the user performing the action (optional).
     :param endpoint: API endpoint where the action was performed.
     """
-    try:
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO logs (level, message, user_email, endpoint)
-                     VALUES (?, ?, ?, ?)''',
-                  (level, message, user_email, endpoint))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error logging to database: {e}")
-    finally:
-        conn.close()
+    log_sink.log(level, message, user_email, endpoint)
 
 @store_bp.route('/register', methods=['POST'])
 def register_store():
@@ -48,18 +41,13 @@ def register_store():
 
     hashed_password = generate_password_hash(password)
     try:
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO stores 
-                     (store_name, store_type, store_description, contact_number, email, password, latitude, longitude)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (store_name, store_type, store_description, contact_number, email, hashed_password, latitude, longitude))
-        conn.commit()
+        data_access.execute('''INSERT INTO stores 
+                               (store_name, store_type, store_description, contact_number, email, password, latitude, longitude)
+                               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                            (store_name, store_type, store_description, contact_number, email, hashed_password, latitude, longitude))
     except sqlite3.Error as e:
         log_to_db('ERROR', f'Database error: {e}', email, '/register')
         return jsonify({'message': 'Failed to register store'}), 500
-    finally:
-        conn.close()
 
     log_to_db('INFO', 'Store registered successfully', email, '/register')
     return jsonify({'message': 'Store registered successfully'}), 201
@@ -79,25 +67,19 @@ def add_product(store_id):
         return jsonify({'message': 'Name and price are required'}), 400
 
     try:
-        conn = sqlite3.connect('stores.db')
-        c = conn.cursor()
-        c.execute('SELECT id FROM stores WHERE id = ?', (store_id,))
-        store = c.fetchone()
-        if not store:
-            log_to_db('ERROR', f'Store with ID {store_id} does not exist', endpoint='/store/add-product')
-            return jsonify({'message': 'Store not found'}), 404
+        with data_access.transaction() as conn:
+            store = conn.execute('SELECT id FROM stores WHERE id = ?', (store_id,)).fetchone()
+            if not store:
+                log_to_db('ERROR', f'Store with ID {store_id} does not exist', endpoint='/store/add-product')
+                return jsonify({'message': 'Store not found'}), 404
 
-        c.execute('''INSERT INTO products 
-                     (store_id, name, price, stock)
-                     VALUES (?, ?, ?, ?)''',
-                  (store_id, name, price, stock))
-        conn.commit()
-        product_id = c.lastrowid
+            product_id = conn.execute('''INSERT INTO products 
+                                         (store_id, name, price, stock)
+                                         VALUES (?, ?, ?, ?)''',
+                                      (store_id, name, price, stock)).lastrowid
     except sqlite3.Error as e:
         log_to_db('ERROR', f'Database error: {e}', endpoint='/store/add-product')
         return jsonify({'message': 'Failed to add product'}), 500
-    finally:
-        conn.close()
 
     log_to_db('INFO', 'Product added successfully', endpoint='/store/add-product')
     return jsonify({
@@ -0,0 +1,241 @@
+"""
+Multi-process launcher: one Flask process serves inference roughly one
+request at a time (the GIL), so throughput only scales with processes.
+
+    python serve.py --workers 4                  # prefork (default)
+    python serve.py --workers 4 --mode dispatch
+
+prefork   The master imports every module, applies the schema migrations,
+          loads SERVE_PRELOAD_MODELS and binds the listening socket, then
+          forks N workers. Each one builds its own app (and background
+          threads) and accepts connections from the shared socket. Dead
+          workers are replaced.
+dispatch  The master starts N model workers in inference_pool, then serves
+          HTTP itself with threads. Upload endpoints and ?async=1 jobs are
+          handed to the next idle model worker; everything else (stores,
+          logs, trends, job status) stays in the master. The workers are
+          forked by a fork server that preloads the app and
+          SERVE_PRELOAD_MODELS (inference_preload.py) and never runs a
+          thread, so a dead worker is replaced without forking the
+          threaded master.
+
+Memory. Forked workers share the master's pages copy-on-write until they
+write to them: the interpreter, Flask/NumPy/pandas/scikit-learn, the
+preloaded price model and the YOLOv8 weights are resident once (in
+dispatch mode once in the fork server, plus the master's own copy). The
+TensorFlow models are loaded in each worker after the fork and stay
+private. TensorFlow and ONNX Runtime start thread pools as soon as a
+model is loaded, and those threads do not survive fork(), so a worker
+forked after such a load can deadlock on its first inference. For the same
+reason nothing runs a dummy inference in the master: warm-up happens in
+the workers. Plain RSS double-counts the shared pages; `kill -USR1 <master>`
+prints RSS, PSS (shared pages split between the processes mapping them)
+and the shared/private split per worker from /proc/<pid>/smaps_rollup.
+Expect the private part of a worker to be about the TensorFlow runtime
+plus the four Keras models. Models served through ONNX Runtime
+(ONNX_MODELS) are smaller still. The shared part is paid only once.
+
+Scaling. Each worker runs SERVE_THREADS_PER_WORKER math threads (default
+CPUs / workers) so N workers do not oversubscribe the cores. Keep
+N x threads at about the core count for near-linear throughput. Per-process
+state stays per process: the in-memory result cache, the price memo and
+the recent-review buffer. The SQLite-backed parts are shared: the job
+queue, sentiment counters, reports and the optional disk cache tier.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+from Config import Config
+import data_access
+import migrations
+from app import create_app, shutdown
+from inference_pool import inference_pool
+from services.model_registry import registry
+
+# Used by the review endpoints only, which never go through the inference pool
+_TEXT_MODELS = ('sentiment', 'porter_stemmer')
+
+_MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_usage(pid):
+    """RSS, PSS, shared and private memory of a process in MB (Linux only)."""
+    kb = dict.fromkeys(_MEMORY_FIELDS, 0)
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in kb:
+                kb[name] = int(value.split()[0])
+    return {
+        'rss_mb': round(kb['Rss'] / 1024, 1),
+        'pss_mb': round(kb['Pss'] / 1024, 1),
+        'shared_mb': round((kb['Shared_Clean'] + kb['Shared_Dirty']) / 1024, 1),
+        'private_mb': round((kb['Private_Clean'] + kb['Private_Dirty']) / 1024, 1),
+    }
+
+
+def print_memory_report(pids):
+    for role, pid in [('master', os.getpid())] + [('worker', pid) for pid in pids]:
+        try:
+            usage = memory_usage(pid)
+        except OSError as e:
+            print(f"{role} {pid}: memory unavailable ({e})")
+            continue
+        print(f"{role} {pid}: rss {usage['rss_mb']} MB, pss {usage['pss_mb']} MB, "
+              f"shared {usage['shared_mb']} MB, private {usage['private_mb']} MB")
+    sys.stdout.flush()
+
+
+def limit_threads(threads):
+    # Read when TensorFlow / ONNX Runtime are first used in this process
+    Config.TF_INTRA_OP_THREADS = threads
+    Config.ONNX_INTRA_OP_THREADS = threads
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def prepare_master():
+    """Work done once, before any fork: schema migrations and the fork-safe models."""
+    with data_access.connection() as conn:
+        migrations.migrate(conn)
+    registry.warm_up(Config.SERVE_PRELOAD_MODELS, dummy_inference=False)
+
+
+def _init_inference_worker(threads):
+    limit_threads(threads)
+    # A worker gets one call at a time, so a micro-batch would only add its wait
+    Config.DAMAGE_BATCH_MAX_SIZE = 1
+    # The vision and price models; the text models stay with the HTTP master
+    names = [name for name in registry.status() if name not in _TEXT_MODELS]
+    registry.warm_up(names, dummy_inference=Config.MODEL_WARMUP_DUMMY_INFERENCE)
+
+
+def _stop(signum, frame):
+    raise SystemExit(0)
+
+
+def serve_dispatch(args, threads):
+    prepare_master()
+    # '__main__' makes this module's worker initializer importable in the fork server
+    inference_pool.start(args.workers, initializer=_init_inference_worker, initargs=(threads,),
+                         finalizer=shutdown, preload=['__main__', 'inference_preload'])
+    print(f"Started {args.workers} inference workers: {inference_pool.pids()}")
+
+    # The master never runs a model; the workers warm up their own
+    Config.MODEL_WARMUP = False
+    server = make_server(args.host, args.port, create_app(), threaded=True)
+    signal.signal(signal.SIGUSR1, lambda *_: print_memory_report(inference_pool.pids()))
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"Serving on http://{args.host}:{args.port} (dispatch, {args.workers} workers)")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        inference_pool.close()
+
+
+def _run_worker(args, listener, threads):
+    code = 0
+    app = None
+    try:
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        limit_threads(threads)
+        # create_app starts this process's job, log and review threads
+        app = create_app()
+        server = make_server(args.host, args.port, app, threaded=True, fd=listener.fileno())
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    except BaseException as e:
+        print(f"Worker {os.getpid()} failed: {e}")
+        code = 1
+    finally:
+        # os._exit skips atexit; flush the log, report and review writers first
+        shutdown(app)
+        os._exit(code)
+
+
+def _spawn(args, listener, threads):
+    pid = os.fork()
+    if pid == 0:
+        _run_worker(args, listener, threads)
+    return pid
+
+
+def serve_prefork(args, threads):
+    prepare_master()
+    listener = socket.create_server((args.host, args.port), backlog=1024, reuse_port=False)
+    listener.set_inheritable(True)
+
+    state = {'stopping': False, 'report': False}
+
+    def stop(signum, frame):
+        state['stopping'] = True
+
+    def request_report(signum, frame):
+        state['report'] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, request_report)
+
+    workers = {_spawn(args, listener, threads) for _ in range(args.workers)}
+    print(f"Serving on http://{args.host}:{args.port} (prefork, workers {sorted(workers)})")
+    sys.stdout.flush()
+
+    while not state['stopping']:
+        time.sleep(0.5)
+        if state['report']:
+            state['report'] = False
+            print_memory_report(sorted(workers))
+        while workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            workers.discard(pid)
+            if not state['stopping']:
+                print(f"Worker {pid} exited with status {status}; starting a replacement")
+                workers.add(_spawn(args, listener, threads))
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('prefork', 'dispatch'), default=Config.SERVE_MODE)
+    parser.add_argument('--workers', type=int, default=Config.SERVE_WORKERS or os.cpu_count())
+    parser.add_argument('--threads-per-worker', type=int, default=Config.SERVE_THREADS_PER_WORKER)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    if args.mode == 'dispatch':
+        serve_dispatch(args, threads)
+    else:
+        serve_prefork(args, threads)
+
+
+if __name__ == '__main__':
+    main()
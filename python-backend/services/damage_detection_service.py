@@ -1,83 +1,145 @@
 import os
+import threading
 import numpy as np
-import tensorflow as tf
-from PIL import Image
-from torchvision import transforms
-from ultralytics import YOLO
+
+from Config import Config
+from services.batching import MicroBatcher
+from services.image_pipeline import Letterbox, ensure_decoded
+from services.inference import runner
+from services.model_registry import load_keras_model, registry
+from services.onnx_backend import backend_loader, onnx_path, uses_onnx
 
 # Compute paths
 _BASE_DIR = os.path.dirname(__file__)
 _YOLO_PATH = os.path.join(_BASE_DIR, '..', 'models', 'best.pt')
 _EFFICIENTNET_PATH = os.path.join(_BASE_DIR, '..', 'models', 'EfficientNetV2_DamageDetection.keras')
 
-# Load both models once at module import
-print("Loading YOLOv8 model…")
-_MODEL_YOLO = YOLO(_YOLO_PATH)
 
-print("Loading EfficientNetV2 model…")
-_MODEL_EFFICIENTNET = tf.keras.models.load_model(_EFFICIENTNET_PATH)
+# Models are loaded on first use (or by the warm-up thread), not at import
+def _load_yolo():
+    from ultralytics import YOLO
+    if uses_onnx('yolov8_damage'):
+        # Ultralytics runs the exported graph through ONNX Runtime with the same API
+        return YOLO(onnx_path('yolov8_damage'), task='detect')
+    return YOLO(_YOLO_PATH)
+
+
+def yolo_settings(**overrides):
+    """
+    Keyword arguments of every YOLO call. The confidence threshold and
+    max_det=1 are applied inside NMS, so a result holds at most one box,
+    and only if something cleared the threshold.
+    """
+    settings = {
+        'imgsz': Config.YOLO_IMGSZ,
+        'conf': Config.YOLO_CONF,
+        'max_det': Config.YOLO_MAX_DET,
+        'classes': Config.YOLO_CLASSES or None,
+        'verbose': False,
+    }
+    settings.update(overrides)
+    return settings
+
+
+def repairable(results, conf=None):
+    # One vectorized comparison per image instead of a Python loop over the boxes
+    threshold = Config.YOLO_CONF if conf is None else conf
+    return [bool((result.boxes.conf > threshold).any()) for result in results]
+
+
+registry.register(
+    'yolov8_damage', _load_yolo,
+    warmup=lambda model: model(np.zeros((Config.YOLO_IMGSZ, Config.YOLO_IMGSZ, 3), dtype=np.uint8),
+                               **yolo_settings()),
+)
+_efficientnet = runner('efficientnetv2_damage', (224, 224, 3))
+registry.register(
+    'efficientnetv2_damage', backend_loader('efficientnetv2_damage', lambda: load_keras_model(_EFFICIENTNET_PATH)),
+    warmup=_efficientnet.warmup,
+)
+
+# YOLO input canvases, reused across batches
+_LETTERBOX = Letterbox(Config.YOLO_IMGSZ)
+
+_UNKNOWN = {'damage_type': 'Unknown', 'repairability': 'Unknown'}
 
-print("Models loaded successfully")
 
 class DamageDetectionService:
-    def __init__(self):
-        # Just reference the pre-loaded models
-        self.model_yolo = _MODEL_YOLO
-        self.efficientnet_model = _MODEL_EFFICIENTNET
+    @property
+    def model_yolo(self):
+        return registry.get('yolov8_damage')
+
+    @property
+    def efficientnet_model(self):
+        return registry.get('efficientnetv2_damage')
 
     def predict_damage_and_repairability(self, image_file):
-        temp_path = "temp_image.jpg"
         try:
-            image_file.save(temp_path)
-
-            damage_type    = self._predict_damage_type(temp_path)
-            repairability  = self._predict_repairability(temp_path)
-
-            return {
-                'damage_type': damage_type,
-                'repairability': repairability
-            }
+            # YOLO is the largest input, so its size bounds the JPEG draft decode
+            image = ensure_decoded(image_file, draft_size=max(Config.YOLO_IMGSZ, 224)).image
+            if Config.DAMAGE_BATCH_MAX_SIZE <= 1:
+                # Nothing to stack with (an inference pool worker runs one call at a time)
+                return self.predict_batch([image])[0]
+            # Concurrent requests are stacked into one forward pass per model
+            return _get_batcher().submit(image).result()
         except Exception as e:
             print(f"Prediction error: {e}")
-            return {
-                'damage_type': 'Unknown',
-                'repairability': 'Unknown'
-            }
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-
-    def _predict_damage_type(self, image_path):
+            return dict(_UNKNOWN)
+
+    def predict_batch(self, images):
+        """
+        Runs EfficientNetV2 and YOLOv8 once over a list of RGB PIL images and
+        returns one {'damage_type', 'repairability'} dict per image.
+        """
+        damage_types = self._predict_damage_type(images)
+        repairabilities = self._predict_repairability(images)
+        return [
+            {'damage_type': damage_type, 'repairability': repairability}
+            for damage_type, repairability in zip(damage_types, repairabilities)
+        ]
+
+    def _predict_damage_type(self, images):
         try:
-            img = Image.open(image_path)
-            batch = self._preprocess_image_for_efficientnet(img)
-            pred  = self.efficientnet_model.predict(batch)
-            return 'Dent' if pred[0][0] > 0.5 else 'Scratch'
+            batch = np.concatenate([self._preprocess_image_for_efficientnet(img) for img in images])
+            pred  = _efficientnet(batch)
+            return ['Dent' if p[0] > 0.5 else 'Scratch' for p in pred]
         except Exception as e:
             print(f"Damage type prediction error: {e}")
-            return 'Unknown'
+            return ['Unknown'] * len(images)
 
-    def _predict_repairability(self, image_path):
+    def _predict_repairability(self, images):
         try:
-            img    = Image.open(image_path)
-            batch  = self._preprocess_image_for_yolo(img)
-            results = self.model_yolo(batch)[0]
-            boxes   = results.boxes
-            repairable = any(box.conf[0] > 0.5 for box in boxes)
-            return 'Repairable' if repairable else 'Unrepairable'
+            # Already letterboxed to YOLO_IMGSZ, so ultralytics only stacks the arrays
+            batch   = self._preprocess_image_for_yolo(images)
+            results = self.model_yolo(batch, **yolo_settings())
+            return ['Repairable' if found else 'Unrepairable' for found in repairable(results)]
         except Exception as e:
             print(f"Repairability prediction error: {e}")
-            return 'Unknown'
+            return ['Unknown'] * len(images)
 
     @staticmethod
-    def _preprocess_image_for_yolo(image):
-        return transforms.Compose([
-            transforms.Resize((640, 640)),
-            transforms.ToTensor(),
-        ])(image).unsqueeze(0)
+    def _preprocess_image_for_yolo(images):
+        return _LETTERBOX(images)
 
     @staticmethod
     def _preprocess_image_for_efficientnet(image):
         image = image.resize((224, 224))
         arr   = np.array(image) / 255.0
         return np.expand_dims(arr, axis=0)
+
+
+_BATCHER = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def _get_batcher():
+    global _BATCHER
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = MicroBatcher(
+                DamageDetectionService().predict_batch,
+                max_batch_size=Config.DAMAGE_BATCH_MAX_SIZE,
+                max_wait_ms=Config.DAMAGE_BATCH_MAX_WAIT_MS,
+                name='damage-detection-batcher',
+            )
+    return _BATCHER
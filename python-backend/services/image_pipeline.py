@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Uploads are written to disk off the request thread
+_WRITER = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+
+class DecodedImage:
+    """
+    An uploaded image decoded once in memory and shared by every model stage.
+
+    `data` keeps the original encoded bytes (for persisting or hashing) and
+    `image` is the decoded RGB PIL image. When `draft_size` is given and the
+    upload is a JPEG, the decoder is asked for a reduced-size version that is
+    still at least `draft_size` on both sides, which skips most of the IDCT
+    work for phone photos that are then resized to 224/256/640 px anyway.
+    """
+
+    def __init__(self, data, filename=None, draft_size=None):
+        self.data = data
+        self.filename = filename
+        image = Image.open(io.BytesIO(data))
+        if draft_size and image.format == 'JPEG':
+            image.draft('RGB', (draft_size, draft_size))
+        self.image = image.convert('RGB')
+        self._resized = {}
+
+    @classmethod
+    def from_upload(cls, file_storage, draft_size=None):
+        return cls(file_storage.read(), filename=file_storage.filename, draft_size=draft_size)
+
+    @classmethod
+    def from_path(cls, path, draft_size=None):
+        with open(path, 'rb') as f:
+            return cls(f.read(), filename=os.path.basename(path), draft_size=draft_size)
+
+    def resized(self, size, mode='RGB'):
+        """Returns the image resized to `size` and converted to `mode`, cached per (size, mode)."""
+        key = (tuple(size), mode)
+        image = self._resized.get(key)
+        if image is None:
+            if mode == 'RGB':
+                image = self.image.resize(size)
+            else:
+                image = self.resized(size, 'RGB').convert(mode)
+            self._resized[key] = image
+        return image
+
+    def to_array(self, size, mode='RGB'):
+        return np.asarray(self.resized(size, mode))
+
+    def persist_async(self, path):
+        """Writes the original bytes to `path` in the background and returns the Future."""
+        return persist_async(path, self.data)
+
+
+class Letterbox:
+    """
+    Fits RGB PIL images into a square canvas the way ultralytics does:
+    resized to keep the aspect ratio, centered, padded with gray (114) and
+    flipped to BGR, which is what YOLO expects of NumPy input. Each thread
+    reuses its own preallocated canvases, so a returned array stays valid
+    only until that thread's next call.
+    """
+
+    PAD_VALUE = 114
+
+    def __init__(self, size=640):
+        self.size = size
+        self._local = threading.local()
+
+    def __call__(self, images):
+        """Returns one (size, size, 3) uint8 BGR view per image."""
+        canvases = getattr(self._local, 'canvases', None)
+        if canvases is None or len(canvases) < len(images):
+            canvases = np.full((len(images), self.size, self.size, 3), self.PAD_VALUE, dtype=np.uint8)
+            self._local.canvases = canvases
+        return [self._fit(image, canvas) for image, canvas in zip(images, canvases)]
+
+    def _fit(self, image, canvas):
+        width, height = image.size
+        ratio = min(self.size / width, self.size / height)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        left = round((self.size - new_width) / 2 - 0.1)
+        top = round((self.size - new_height) / 2 - 0.1)
+        if (new_width, new_height) != (width, height):
+            image = image.resize((new_width, new_height), Image.BILINEAR)
+
+        # Repaint only the borders; the interior is overwritten below
+        canvas[:top] = self.PAD_VALUE
+        canvas[top + new_height:] = self.PAD_VALUE
+        canvas[top:top + new_height, :left] = self.PAD_VALUE
+        canvas[top:top + new_height, left + new_width:] = self.PAD_VALUE
+        canvas[top:top + new_height, left:left + new_width] = np.asarray(image)[..., ::-1]
+        return canvas
+
+
+def persist_async(path, data):
+    return _WRITER.submit(write_file, path, data)
+
+
+def ensure_decoded(image, draft_size=None):
+    """Accepts a DecodedImage, a werkzeug FileStorage or a file path."""
+    if isinstance(image, DecodedImage):
+        return image
+    if isinstance(image, str):
+        return DecodedImage.from_path(image, draft_size=draft_size)
+    return DecodedImage.from_upload(image, draft_size=draft_size)
+
+
+def write_file(path, data):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to persist upload to {path}: {e}")
+        raise
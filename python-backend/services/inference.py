@@ -0,0 +1,83 @@
+import logging
+import threading
+
+import numpy as np
+
+from Config import Config
+from services.model_registry import configure_tensorflow_threads, registry
+from services.onnx_backend import OnnxModel, uses_onnx
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ('function', 'direct', 'predict')
+
+
+class InferenceRunner:
+    """
+    Runs a registered Keras model without going through `model.predict`.
+
+    `predict` builds a data adapter and a step loop on every call, which
+    costs milliseconds for a batch of one. In 'function' mode the model is
+    wrapped once in a `tf.function` whose input signature fixes everything
+    but the batch dimension, so it is traced a single time and every later
+    call goes straight into the graph. 'direct' calls
+    `model(x, training=False)` eagerly; 'predict' keeps the Keras path.
+    Inputs are cast to float32 and the result is returned as a NumPy array.
+    Models served by ONNX Runtime (ONNX_MODELS) are called as they are.
+    """
+
+    def __init__(self, name, input_shape, mode='function'):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {mode}")
+        self.name = name
+        self.input_shape = tuple(input_shape)
+        self.mode = mode
+        self._model = None
+        self._call = None
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.mode == 'predict' and not uses_onnx(self.name):
+            return registry.get(self.name).predict(batch, batch_size=len(batch), verbose=0)
+        return np.asarray(self._callable()(batch))
+
+    def _callable(self):
+        model = registry.get(self.name)
+        if self._model is not model:
+            with self._lock:
+                if self._model is not model:
+                    self._call = self._build(model)
+                    self._model = model
+        return self._call
+
+    def _build(self, model):
+        if isinstance(model, OnnxModel):
+            return model
+        import tensorflow as tf
+        configure_tensorflow_threads()
+        if self.mode == 'direct':
+            return lambda batch: model(tf.convert_to_tensor(batch), training=False)
+
+        @tf.function(input_signature=[tf.TensorSpec((None,) + self.input_shape, tf.float32)])
+        def serve(batch):
+            return model(batch, training=False)
+
+        logger.info(f"Inference graph built for {self.name} with input {(None,) + self.input_shape}")
+        return serve
+
+    def warmup(self, model=None):
+        # Registry warm-up hook: traces the graph with a dummy batch of one
+        self(np.zeros((1,) + self.input_shape, dtype=np.float32))
+
+
+_RUNNERS = {}
+_RUNNERS_LOCK = threading.Lock()
+
+
+def runner(name, input_shape):
+    """The shared runner of a registered model, created on first request."""
+    with _RUNNERS_LOCK:
+        if name not in _RUNNERS:
+            _RUNNERS[name] = InferenceRunner(name, input_shape, Config.INFERENCE_MODE)
+        return _RUNNERS[name]
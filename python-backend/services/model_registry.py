@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from Config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def models_version(models_dir):
+    """Fingerprint of every file under `models_dir` (path, size and mtime)."""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(models_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, models_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+class _ModelEntry:
+    def __init__(self, name, loader, warmup):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.state = 'not_loaded'
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loads models on first use instead of at import time.
+
+    Each model is registered with a `loader` (returns the loaded model) and an
+    optional `warmup` callable that runs a dummy inference, so graph tracing
+    and allocator setup happen before the first real request. `warm_up_async`
+    loads everything in a background thread; `get` blocks only if the model
+    it needs is not ready yet.
+
+    `version` fingerprints the files under `models_dir` that the loaded
+    models came from. It is taken once and again whenever a model loads,
+    never per request. A load that finds the files changed adopts the new
+    fingerprint and marks the other loaded models for reload, so the models
+    in memory always match the version results are cached under.
+    """
+
+    def __init__(self, models_dir=None):
+        self._entries = {}
+        self.models_dir = models_dir
+        self._version = None
+        self._version_lock = threading.Lock()
+
+    def register(self, name, loader, warmup=None):
+        self._entries[name] = _ModelEntry(name, loader, warmup)
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry.state == 'ready':
+            return entry.model
+        with entry.lock:
+            if entry.state != 'ready':
+                self._load(entry)
+        return entry.model
+
+    def warm_up(self, names=None, dummy_inference=True):
+        for name in names or list(self._entries):
+            entry = self._entries[name]
+            try:
+                model = self.get(name)
+            except Exception:
+                continue
+            if dummy_inference and entry.warmup and entry.warmup_seconds is None:
+                start = time.perf_counter()
+                try:
+                    entry.warmup(model)
+                    entry.warmup_seconds = round(time.perf_counter() - start, 3)
+                    logger.info(f"Model {name} warmed up in {entry.warmup_seconds}s")
+                except Exception as e:
+                    logger.error(f"Warm-up of model {name} failed: {e}")
+
+    def warm_up_async(self, names=None, dummy_inference=True):
+        thread = threading.Thread(target=self.warm_up, args=(names, dummy_inference),
+                                  name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            name: {
+                'state': entry.state,
+                'load_seconds': entry.load_seconds,
+                'warmup_seconds': entry.warmup_seconds,
+                'error': entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def version(self):
+        if self.models_dir is None:
+            return '0'
+        if self._version is None:
+            with self._version_lock:
+                if self._version is None:
+                    self._version = models_version(self.models_dir)
+        return self._version
+
+    def ready(self):
+        return all(entry.state == 'ready' for entry in self._entries.values())
+
+    def _load(self, entry):
+        entry.state = 'loading'
+        logger.info(f"Loading model {entry.name}…")
+        # Taken before reading the model file, so a file replaced mid-load is caught on the next load
+        version = models_version(self.models_dir) if self.models_dir is not None else None
+        start = time.perf_counter()
+        try:
+            entry.model = entry.loader()
+        except Exception as e:
+            entry.state = 'failed'
+            entry.error = str(e)
+            logger.error(f"Error loading model {entry.name}: {e}")
+            raise
+        entry.load_seconds = round(time.perf_counter() - start, 3)
+        entry.state = 'ready'
+        entry.error = None
+        logger.info(f"Model {entry.name} loaded in {entry.load_seconds}s")
+        if version is not None:
+            self._adopt_version(version, entry)
+
+    def _adopt_version(self, version, loaded):
+        with self._version_lock:
+            if self._version is None or self._version == version:
+                self._version = version
+                return
+            logger.info(f"Model files changed ({self._version} -> {version}); reloading the other models")
+            self._version = version
+            for entry in self._entries.values():
+                if entry is not loaded and entry.state == 'ready':
+                    entry.state = 'not_loaded'
+
+
+_tf_threads_configured = False
+
+
+def configure_tensorflow_threads():
+    """
+    Applies TF_INTER_OP_THREADS / TF_INTRA_OP_THREADS (0 keeps TensorFlow's
+    default). Must run before TensorFlow executes its first op, so it is
+    called from load_keras_model; later calls are no-ops.
+    """
+    global _tf_threads_configured
+    if _tf_threads_configured:
+        return
+    import tensorflow as tf
+    try:
+        if Config.TF_INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(Config.TF_INTER_OP_THREADS)
+        if Config.TF_INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(Config.TF_INTRA_OP_THREADS)
+    except RuntimeError as e:
+        logger.warning(f"TensorFlow thread pools already initialized: {e}")
+    _tf_threads_configured = True
+
+
+def load_keras_model(path):
+    # TensorFlow is imported here so that importing a service stays cheap
+    import tensorflow as tf
+    configure_tensorflow_threads()
+    return tf.keras.models.load_model(path)
+
+
+registry = ModelRegistry(models_dir=Config.MODELS_DIR)
@@ -0,0 +1,64 @@
+import logging
+import os
+
+import numpy as np
+
+from Config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def uses_onnx(*names):
+    """True if any of the named models is served by ONNX Runtime (ONNX_MODELS)."""
+    return any(name in Config.ONNX_MODELS for name in names)
+
+
+def onnx_path(name, quantized=None):
+    """models/onnx/<name>.onnx, or <name>.int8.onnx for the quantized export."""
+    if quantized is None:
+        quantized = Config.ONNX_QUANTIZED
+    return os.path.join(Config.ONNX_DIR, f"{name}.int8.onnx" if quantized else f"{name}.onnx")
+
+
+class OnnxModel:
+    """
+    An exported Keras model run by an ONNX Runtime CPU session.
+
+    Takes and returns the same NHWC float32 arrays as the Keras model it
+    was exported from, so InferenceRunner calls it in place of the graph.
+    `predict` is kept for code that still uses the Keras call style.
+    """
+
+    def __init__(self, path):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if Config.ONNX_INTRA_OP_THREADS:
+            options.intra_op_num_threads = Config.ONNX_INTRA_OP_THREADS
+        if Config.ONNX_INTER_OP_THREADS:
+            options.inter_op_num_threads = Config.ONNX_INTER_OP_THREADS
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+    def predict(self, batch, **kwargs):
+        return self(batch)
+
+
+def load_onnx_model(name):
+    path = onnx_path(name)
+    logger.info(f"Serving {name} with ONNX Runtime from {path}")
+    return OnnxModel(path)
+
+
+def backend_loader(name, keras_loader):
+    """
+    The registry loader for `name`: the ONNX export when the model is listed
+    in ONNX_MODELS, otherwise the original `keras_loader`.
+    """
+    if uses_onnx(name):
+        return lambda: load_onnx_model(name)
+    return keras_loader
@@ -0,0 +1,222 @@
+"""
+Exports the vision models to ONNX, quantizes them to INT8 and checks the
+exported graphs against the original models.
+
+    export    Keras models via tf2onnx, YOLOv8 via ultralytics, written to
+              models/onnx/<name>.onnx (batch dimension left dynamic)
+    quantize  <name>.onnx -> <name>.int8.onnx; 'dynamic' quantizes weights
+              only, 'static' also calibrates activations on the --images photos
+    validate  runs the original and the exported model on the --images photos
+              and reports output drift and how often their decisions agree
+              (class, damage type, tread depth within 0.25 mm, repairability);
+              exits non-zero below --min-agreement
+
+Usage (from python-backend/):
+    python -m services.onnx_export export
+    python -m services.onnx_export quantize --mode static --images uploads/damage/originals
+    python -m services.onnx_export validate --quantized --images samples/ --min-agreement 0.98
+
+The exports are then enabled per model with ONNX_MODELS (and ONNX_QUANTIZED).
+
+ONNX support is optional, so its packages are not in requirements.txt:
+    pip install onnxruntime           # serving, quantize, validate
+    pip install tf2onnx onnx          # export of the Keras models
+"""
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from Config import Config
+from services import damage_detection_service as damage
+from services import tire_segmentation_service as tire
+from services import vehicle_classification_service as vehicle
+from services.image_pipeline import DecodedImage
+from services.model_registry import load_keras_model
+from services.onnx_backend import OnnxModel, onnx_path
+
+YOLO_MODEL = 'yolov8_damage'
+
+
+def _yolo_input(image):
+    # The service's letterboxed BGR canvas as the RGB NCHW float batch the exported graph takes
+    canvas = damage.DamageDetectionService._preprocess_image_for_yolo([image.image])[0]
+    return np.ascontiguousarray(canvas[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def _damage_type(outputs):
+    return outputs[:, 0] > 0.5
+
+
+def _tread_depth(outputs):
+    return np.array([metrics['predicted_tire_depth_mm'] for metrics in tire.tread_depth_metrics(outputs)])
+
+
+# name: (original file, input shape, preprocessing of a DecodedImage, decision)
+KERAS_MODELS = {
+    'efficientnetv2_damage': (
+        damage._EFFICIENTNET_PATH, (224, 224, 3),
+        lambda image: damage.DamageDetectionService._preprocess_image_for_efficientnet(image.image),
+        _damage_type),
+    'resnet50_tire': (
+        tire._RESNET_MODEL_PATH, (224, 224, 3),
+        tire.TireSegmentationService._preprocess_image_for_resnet,
+        lambda outputs: np.argmax(outputs, axis=1)),
+    'unet_tire': (
+        tire._UNET_MODEL_PATH, (256, 256, 1),
+        tire.TireSegmentationService._preprocess_image_for_unet,
+        _tread_depth),
+    'mobilenetv2_vehicle': (
+        vehicle._MOBILENET_PATH, (224, 224, 3),
+        vehicle.VehicleClassificationService._preprocess_image_for_mobilenetv2,
+        lambda outputs: np.argmax(outputs, axis=1)),
+}
+
+MODELS = list(KERAS_MODELS) + [YOLO_MODEL]
+
+# Decisions compared by `validate` are equal, or within this for tread depth (mm)
+_DEPTH_TOLERANCE_MM = 0.25
+
+
+def sample_images(images_dir, count):
+    """Up to `count` images from `images_dir` (searched recursively)."""
+    paths = sorted(path for pattern in ('*.jpg', '*.jpeg', '*.png')
+                   for path in glob.glob(os.path.join(images_dir, '**', pattern), recursive=True))
+    return [DecodedImage.from_path(path) for path in paths[:count]]
+
+
+def model_input(name, image):
+    if name == YOLO_MODEL:
+        return _yolo_input(image)
+    return KERAS_MODELS[name][2](image).astype(np.float32)
+
+
+def export(name, opset):
+    path = onnx_path(name, quantized=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if name == YOLO_MODEL:
+        from ultralytics import YOLO
+        exported = YOLO(damage._YOLO_PATH).export(format='onnx', imgsz=640, dynamic=True, simplify=True,
+                                                  opset=opset)
+        os.replace(exported, path)
+    else:
+        import tensorflow as tf
+        import tf2onnx
+        source, input_shape = KERAS_MODELS[name][:2]
+        signature = (tf.TensorSpec((None,) + input_shape, tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(load_keras_model(source), input_signature=signature, opset=opset,
+                                   output_path=path)
+    print(f"{name}: exported to {path}")
+
+
+def quantize(name, mode, images):
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, \
+        quantize_static
+
+    source, target = onnx_path(name, quantized=False), onnx_path(name, quantized=True)
+    if mode == 'dynamic':
+        quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    else:
+        input_name = ort.InferenceSession(source, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+        class SampleReader(CalibrationDataReader):
+            # Feeds the preprocessed sample images to the calibrator, one per batch
+            def __init__(self):
+                self.batches = iter([{input_name: model_input(name, image)} for image in images])
+
+            def get_next(self):
+                return next(self.batches, None)
+
+        reader = SampleReader()
+        quantize_static(source, target, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    size = os.path.getsize(source) / 2 ** 20, os.path.getsize(target) / 2 ** 20
+    print(f"{name}: {mode} INT8 model written to {target} ({size[0]:.1f} MB -> {size[1]:.1f} MB)")
+
+
+def _yolo_repairable(model, batch):
+    return np.array(damage.repairable(model(batch, **damage.yolo_settings())))
+
+
+def validate(name, quantized, images):
+    """Returns the fraction of images on which original and export reach the same decision."""
+    path = onnx_path(name, quantized)
+    if name == YOLO_MODEL:
+        from ultralytics import YOLO
+        canvases = [canvas.copy() for canvas in damage.DamageDetectionService._preprocess_image_for_yolo(
+            [image.image for image in images])]
+        expected = _yolo_repairable(YOLO(damage._YOLO_PATH), canvases)
+        actual = _yolo_repairable(YOLO(path, task='detect'), canvases)
+        agreement = float(np.mean(expected == actual))
+        print(f"{name}: {os.path.basename(path)} repairability agreement {agreement:.3f} over {len(images)} images")
+        return agreement
+
+    source, _, _, decision = KERAS_MODELS[name]
+    batch = np.concatenate([model_input(name, image) for image in images])
+    reference = load_keras_model(source).predict(batch, batch_size=len(batch), verbose=0)
+    outputs = OnnxModel(path)(batch)
+    expected, actual = decision(reference), decision(outputs)
+    if name == 'unet_tire':
+        matches = np.abs(expected - actual) <= _DEPTH_TOLERANCE_MM
+    else:
+        matches = expected == actual
+    agreement = float(np.mean(matches))
+    print(f"{name}: {os.path.basename(path)} max abs output difference "
+          f"{float(np.max(np.abs(reference - outputs))):.2e}, agreement {agreement:.3f} over {len(images)} images")
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export')
+    export_parser.add_argument('--opset', type=int, default=17)
+
+    quantize_parser = commands.add_parser('quantize')
+    quantize_parser.add_argument('--mode', choices=('dynamic', 'static'), default='dynamic')
+
+    validate_parser = commands.add_parser('validate')
+    # --no-quantized checks the float exports even when ONNX_QUANTIZED is set
+    validate_parser.add_argument('--quantized', action=argparse.BooleanOptionalAction, default=Config.ONNX_QUANTIZED)
+    validate_parser.add_argument('--min-agreement', type=float, default=0.98)
+
+    for command in (export_parser, quantize_parser, validate_parser):
+        command.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    # Real photos only: noise calibrates the wrong activation ranges and says nothing about agreement
+    quantize_parser.add_argument('--images', help='directory of sample photos (required for --mode static)')
+    validate_parser.add_argument('--images', required=True, help='directory of sample photos')
+    for command in (quantize_parser, validate_parser):
+        command.add_argument('--samples', type=int, default=64)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        for name in args.models:
+            export(name, args.opset)
+        return
+
+    if args.command == 'quantize' and args.mode == 'dynamic':
+        for name in args.models:
+            quantize(name, args.mode, [])
+        return
+    if not args.images:
+        parser.error('--images is required for --mode static')
+    images = sample_images(args.images, args.samples)
+    if not images:
+        parser.error(f"No images found in {args.images}")
+    if args.command == 'quantize':
+        for name in args.models:
+            quantize(name, args.mode, images)
+        return
+
+    failed = [name for name in args.models if validate(name, args.quantized, images) < args.min_agreement]
+    if failed:
+        print(f"Below {args.min_agreement:.0%} agreement: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
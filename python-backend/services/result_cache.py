@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from Config import Config
+from services.model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+_DISK_SCHEMA = '''CREATE TABLE IF NOT EXISTS inference_cache
+                  (key TEXT PRIMARY KEY,
+                   model_version TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   expires_at REAL NOT NULL,
+                   last_access REAL NOT NULL)'''
+
+
+class ResultCache:
+    """
+    Caches inference results by a hash of the uploaded image bytes.
+
+    Lookups go to an in-process LRU first and then, when `disk_path` is set,
+    to a SQLite file shared by all worker processes. Entries expire after
+    `ttl` seconds, and both tiers evict least-recently-used entries beyond
+    their size limits. Keys include `version()`, the fingerprint of the
+    model files the registry loaded (ModelRegistry.version), so results are
+    only ever stored under the version of the models that computed them.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, disk_path=None, disk_max_entries=100000,
+                 version=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self.version = version or (lambda: '0')
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_pid = None
+        self._disk_writes = 0
+        self._version = None
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get_or_compute(self, namespace, data, compute, cacheable=None):
+        """
+        Returns the cached result for `data` (image bytes) under `namespace`,
+        or runs `compute()` and stores its result unless `cacheable(result)`
+        is false.
+        """
+        key = self.key(namespace, data)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.set(key, value)
+        return value
+
+    def key(self, namespace, data):
+        return f"{namespace}:{self.model_version()}:{hashlib.sha256(data).hexdigest()}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return True, value
+                del self._memory[key]
+
+            row = self._disk_get(key, now)
+            if row is not None:
+                value, expires_at = json.loads(row[0]), row[1]
+                self._memory_set(key, value, expires_at)
+                self._counters['disk_hits'] += 1
+                return True, value
+
+            self._counters['misses'] += 1
+            return False, None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+            self._disk_set(key, value, expires_at)
+
+    def model_version(self):
+        version = self.version()
+        if version != self._version:
+            with self._lock:
+                if self._version is not None and version != self._version:
+                    logger.info(f"Models changed ({self._version} -> {version}); dropping cached results")
+                    self._memory.clear()
+                    self._disk_purge_versions(version)
+                    self._counters['invalidations'] += 1
+                self._version = version
+        return version
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._disk_conn()
+            if conn is not None:
+                with conn:
+                    conn.execute('DELETE FROM inference_cache')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+            conn = self._disk_conn()
+            stats['disk_entries'] = conn.execute('SELECT COUNT(*) FROM inference_cache').fetchone()[0] if conn else None
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['disk_hits']) / lookups, 4) if lookups else None
+        stats['model_version'] = self._version
+        return stats
+
+    def _memory_set(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    # The SQLite tier; callers hold self._lock
+
+    def _disk_conn(self):
+        if not self.disk_path:
+            return None
+        if self._disk is None or self._disk_pid != os.getpid():
+            # A connection must not be shared with a forked child
+            self._disk = sqlite3.connect(self.disk_path, timeout=Config.SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+            self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute('PRAGMA synchronous=NORMAL')
+            self._disk.execute(_DISK_SCHEMA)
+            self._disk.execute('CREATE INDEX IF NOT EXISTS idx_inference_cache_access ON inference_cache (last_access)')
+            self._disk_pid = os.getpid()
+        return self._disk
+
+    def _disk_get(self, key, now):
+        conn = self._disk_conn()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute('SELECT value, expires_at FROM inference_cache WHERE key = ? AND expires_at > ?',
+                               (key, now)).fetchone()
+            if row is not None:
+                with conn:
+                    conn.execute('UPDATE inference_cache SET last_access = ? WHERE key = ?', (now, key))
+            return row
+        except sqlite3.Error as e:
+            logger.error(f"Result cache read failed: {e}")
+            return None
+
+    def _disk_set(self, key, value, expires_at):
+        conn = self._disk_conn()
+        if conn is None:
+            return
+        now = time.time()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO inference_cache VALUES (?, ?, ?, ?, ?)',
+                             (key, self._version or '0', json.dumps(value), expires_at, now))
+                self._disk_writes += 1
+                # Trim expired and least-recently-used rows every so often, not on every write
+                if self._disk_writes % 100 == 0:
+                    conn.execute('DELETE FROM inference_cache WHERE expires_at <= ?', (now,))
+                    conn.execute('''DELETE FROM inference_cache WHERE key IN
+                                    (SELECT key FROM inference_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)''',
+                                 (self.disk_max_entries,))
+        except sqlite3.Error as e:
+            logger.error(f"Result cache write failed: {e}")
+
+    def _disk_purge_versions(self, version):
+        conn = self._disk_conn()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute('DELETE FROM inference_cache WHERE model_version != ?', (version,))
+        except sqlite3.Error as e:
+            logger.error(f"Result cache purge failed: {e}")
+
+
+result_cache = ResultCache(
+    max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+    ttl=Config.RESULT_CACHE_TTL,
+    disk_path=Config.RESULT_CACHE_DISK_PATH if Config.RESULT_CACHE_DISK else None,
+    disk_max_entries=Config.RESULT_CACHE_DISK_MAX_ENTRIES,
+    version=registry.version,
+)
@@ -1,44 +1,174 @@
-from PIL import Image
 import numpy as np
-import tensorflow as tf
 import os
 import logging
-from tensorflow.keras.applications.resnet50 import preprocess_input
+from concurrent.futures import ThreadPoolExecutor
+
+from Config import Config
+from services.image_pipeline import ensure_decoded
+from services.inference import runner
+from services.model_registry import load_keras_model, registry
+from services.onnx_backend import backend_loader, uses_onnx
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class TireSegmentationService:
-    def __init__(self):
-        try:
-            # Load the U-Net model for tire segmentation
-            unet_model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'unet_tire_model.h5')
-            self.model_unet = tf.keras.models.load_model(unet_model_path)
-            logger.info("U-Net model loaded successfully")
-
-            # Load the ResNet50 model for tire condition prediction
-            resnet_model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'resnet50_tire_condition.h5')
-            self.model_resnet = tf.keras.models.load_model(resnet_model_path)
-            logger.info("ResNet50 model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
-            raise
+_UNET_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'unet_tire_model.h5')
+_RESNET_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'resnet50_tire_condition.h5')
+
 
-    def segment_tire(self, image_path):
-        try:
-            logger.info(f"Processing image: {image_path}")
+# U-Net for tire segmentation and ResNet50 for tire condition, loaded on first use
+_unet = runner('unet_tire', (256, 256, 1))
+_resnet = runner('resnet50_tire', (224, 224, 3))
+registry.register('unet_tire', backend_loader('unet_tire', lambda: load_keras_model(_UNET_MODEL_PATH)),
+                  warmup=_unet.warmup)
+registry.register('resnet50_tire', backend_loader('resnet50_tire', lambda: load_keras_model(_RESNET_MODEL_PATH)),
+                  warmup=_resnet.warmup)
+
+
+def _build_fused_graph():
+    # Both models traced into one graph: a single call yields condition and depth
+    import tensorflow as tf
+    resnet = registry.get('resnet50_tire')
+    unet = registry.get('unet_tire')
+
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, 224, 224, 3], tf.float32),
+        tf.TensorSpec([None, 256, 256, 1], tf.float32),
+    ])
+    def fused(resnet_input, unet_input):
+        return resnet(resnet_input, training=False), unet(unet_input, training=False)
+
+    return fused
+
+
+# The fused graph needs both models in TensorFlow
+_FUSED_GRAPH = Config.TIRE_FUSED_GRAPH and not uses_onnx('unet_tire', 'resnet50_tire')
+
+if _FUSED_GRAPH:
+    registry.register(
+        'tire_fused', _build_fused_graph,
+        warmup=lambda fused: fused(np.zeros((1, 224, 224, 3), dtype=np.float32),
+                                   np.zeros((1, 256, 256, 1), dtype=np.float32)),
+    )
+
+# ResNet50 runs here while U-Net runs on the request thread
+_EXECUTOR = ThreadPoolExecutor(max_workers=Config.TIRE_PARALLEL_WORKERS, thread_name_prefix='tire-model')
+
+_CONDITION_LABELS = ["very good", "good", "middle", "low"]
+
+# Tread below this depth (or a "low" condition) means the tire should be replaced
+REPLACE_DEPTH_MM = 3.0
+
+# What keras.applications.resnet50.preprocess_input does ('caffe' mode):
+# RGB -> BGR, then subtract these ImageNet channel means; no scaling
+_RESNET_MEAN_BGR = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+# Real-world depth range (in mm) that mask coverage is mapped onto
+MIN_DEPTH_MM = 1.59  # Unsafe tread depth in mm (2/32")
+MAX_DEPTH_MM = 8.73  # New tire tread depth in mm (11/32")
+
+
+def _coverage_to_depth_mm(coverage):
+    return MIN_DEPTH_MM + coverage * (MAX_DEPTH_MM - MIN_DEPTH_MM)
+
+
+def tread_depth_metrics(prediction, thresholds=None, bands=None):
+    """
+    Depth metrics for a batch of U-Net outputs, (N, 256, 256, 1) float32.
+
+    One vectorized pass: the batch is compared against every threshold at
+    once, pixels above each threshold are counted per row, and the band
+    counts are differences of the cumulative row counts at the band edges.
+
+    Returns one dict per image; 'predicted_tire_depth_mm' is the depth at
+    the 0.5 threshold, exactly as before.
+    """
+    thresholds = sorted(set(thresholds or Config.TIRE_DEPTH_THRESHOLDS) | {0.5})
+    bands = bands or Config.TIRE_TREAD_BANDS
+    prediction = np.asarray(prediction)
+    n, height, width = prediction.shape[:3]
+    prediction = prediction.reshape(n, height, width)  # drops the channel axis without copying
+
+    edges = np.linspace(0, height, bands + 1).astype(int)
+    band_pixels = np.diff(edges) * width
+    # (N, T, H): pixels above each threshold in each row
+    row_counts = np.count_nonzero(
+        prediction[:, None] > np.asarray(thresholds, dtype=prediction.dtype)[None, :, None, None], axis=3)
+    cumulative = np.concatenate([np.zeros((n, len(thresholds), 1), dtype=np.int64),
+                                 np.cumsum(row_counts, axis=2)], axis=2)
+    counts = cumulative[:, :, edges[1:]] - cumulative[:, :, edges[:-1]]
+
+    primary = thresholds.index(0.5)
+    total_depth = _coverage_to_depth_mm(counts.sum(axis=2) / (height * width))
+    band_depth = _coverage_to_depth_mm(counts[:, primary] / band_pixels)
+
+    return [{
+        'predicted_tire_depth_mm': float(total_depth[i, primary]),
+        'depth_by_threshold_mm': {
+            f'{threshold:g}': round(float(depth), 3) for threshold, depth in zip(thresholds, total_depth[i])
+        },
+        'tread_band_depths_mm': [round(float(depth), 3) for depth in band_depth[i]],
+        'tread_band_stats_mm': {
+            'min': round(float(band_depth[i].min()), 3),
+            'mean': round(float(band_depth[i].mean()), 3),
+            'max': round(float(band_depth[i].max()), 3),
+        },
+    } for i in range(n)]
+
+
+def summarize_tire_set(tires):
+    """Vehicle-level summary of the per-tire reports from segment_tires."""
+    depths = [tire['predicted_tire_depth_mm'] for tire in tires]
+    worst = max((tire['tire_condition'] for tire in tires), key=_CONDITION_LABELS.index)
+    replace = [i for i, tire in enumerate(tires)
+               if tire['tire_condition'] == 'low' or tire['predicted_tire_depth_mm'] < REPLACE_DEPTH_MM]
+
+    if replace:
+        recommendation = f"Replace {len(replace)} of {len(tires)} tires"
+    elif worst == 'middle':
+        recommendation = "Tires are usable; check tread again soon"
+    else:
+        recommendation = "All tires are in good condition"
+
+    return {
+        'tire_count': len(tires),
+        'worst_condition': worst,
+        'min_depth_mm': round(min(depths), 2),
+        'mean_depth_mm': round(sum(depths) / len(depths), 2),
+        'tires_to_replace': replace,
+        'recommendation': recommendation,
+    }
 
-            # Step 1: Predict tire condition using ResNet50
-            tire_condition = self._predict_tire_condition(image_path)
 
-            # Step 2: Predict tire depth using U-Net
-            predicted_depth = self._predict_tire_depth(image_path)
+class TireSegmentationService:
+    @property
+    def model_unet(self):
+        return registry.get('unet_tire')
+
+    @property
+    def model_resnet(self):
+        return registry.get('resnet50_tire')
+
+    def segment_tire(self, image):
+        try:
+            # Decode once; both models work from the same in-memory image
+            image = ensure_decoded(image, draft_size=256)
+            logger.info(f"Processing image: {image.filename}")
+
+            if _FUSED_GRAPH:
+                # One graph call runs both models
+                tire_condition, depth_metrics = self._predict_fused(image)
+            else:
+                # The models are independent: ResNet50 (condition) and U-Net (depth) run concurrently
+                condition_future = _EXECUTOR.submit(self._predict_tire_condition, image)
+                depth_metrics = self._predict_tire_depth(image)
+                tire_condition = condition_future.result()
 
             # Prepare response
             response = {
                 'tire_condition': tire_condition,
-                'predicted_tire_depth_mm': predicted_depth
+                **depth_metrics
             }
             logger.info("Backend Response: %s", response)  # Debug log
 
@@ -47,74 +177,112 @@ class TireSegmentationService:
             logger.error(f"Error in segment_tire: {e}")
             raise
 
-    def _predict_tire_condition(self, image_path):
+    def segment_tires(self, images):
+        """
+        Assesses a whole tire set (four tires plus the spare, say) at once:
+        the inputs are stacked so ResNet50 and U-Net each run a single
+        prediction over the batch. Returns per-tire reports and a summary.
+        """
         try:
-            # Load the image
-            image = Image.open(image_path)
-            logger.info("Image loaded successfully")
+            images = [ensure_decoded(image, draft_size=256) for image in images]
+            resnet_batch = np.concatenate([self._preprocess_image_for_resnet(image) for image in images])
+            unet_batch = np.concatenate([self._preprocess_image_for_unet(image) for image in images])
+
+            if _FUSED_GRAPH:
+                condition_prediction, depth_prediction = registry.get('tire_fused')(
+                    resnet_batch.astype(np.float32), unet_batch.astype(np.float32))
+                condition_prediction, depth_prediction = condition_prediction.numpy(), depth_prediction.numpy()
+            else:
+                condition_future = _EXECUTOR.submit(_resnet, resnet_batch)
+                depth_prediction = _unet(unet_batch)
+                condition_prediction = condition_future.result()
+            logger.info(f"Tire set of {len(images)} images predicted")
+
+            conditions = self._conditions_from_prediction(condition_prediction)
+            depths = tread_depth_metrics(depth_prediction)
+            tires = [{
+                'image': image.filename,
+                'tire_condition': condition,
+                **depth,
+            } for image, condition, depth in zip(images, conditions, depths)]
+
+            return {'tires': tires, 'summary': summarize_tire_set(tires)}
+        except Exception as e:
+            logger.error(f"Error in segment_tires: {e}")
+            raise
 
+    def _predict_tire_condition(self, image):
+        try:
             # Preprocess the image for ResNet50 model
             processed_image = self._preprocess_image_for_resnet(image)
             logger.info("Image preprocessed for ResNet50")
 
             # Predict tire condition
-            prediction = self.model_resnet.predict(processed_image)
-            logger.info("Raw Prediction Output: %s", prediction)  # Debug log
-
-            # Get the predicted class index
-            predicted_class_index = np.argmax(prediction, axis=1)[0]
-            logger.info("Predicted Class Index: %s", predicted_class_index)  # Debug log
-
-            # Map the predicted class index to the corresponding label
-            labels = ["very good", "good", "middle", "low"]
-            condition = labels[predicted_class_index]
-            logger.info(f"Tire Condition Prediction: {condition}")  # Debug log
-
-            return condition
+            prediction = _resnet(processed_image)
+            return self._condition_from_prediction(prediction)
         except Exception as e:
             logger.error(f"Error in _predict_tire_condition: {e}")
             raise
 
-    def _predict_tire_depth(self, image_path):
+    def _predict_tire_depth(self, image):
         try:
-            # Load the image
-            image = Image.open(image_path)
-            logger.info("Image loaded successfully")
-
             # Preprocess the image for U-Net model
             processed_image = self._preprocess_image_for_unet(image)
             logger.info("Image preprocessed for U-Net")
 
             # Predict the tire segmentation using U-Net
-            prediction = self.model_unet.predict(processed_image)
+            prediction = _unet(processed_image)
             logger.info("U-Net prediction completed")
-
-            # Post-process the mask
-            mask = (prediction[0] > 0.5).astype(np.uint8)  # Binary mask thresholding
-            logger.info("Mask post-processed")
-
-            # Calculate predicted depth from the mask
-            predicted_depth = self._calculate_predicted_depth(mask)
-            logger.info(f"Predicted Depth: {predicted_depth}")
-
-            return predicted_depth
+            return self._depth_from_prediction(prediction)
         except Exception as e:
             logger.error(f"Error in _predict_tire_depth: {e}")
             raise
 
-    @staticmethod
-    def _preprocess_image_for_resnet(image):
+    def _predict_fused(self, image):
         try:
-            # Resize the image to the expected input size of the model (224x224)
-            target_size = (224, 224)
-            image = image.resize(target_size)
+            resnet_input = self._preprocess_image_for_resnet(image).astype(np.float32)
+            unet_input = self._preprocess_image_for_unet(image).astype(np.float32)
+            condition_prediction, depth_prediction = registry.get('tire_fused')(resnet_input, unet_input)
+            logger.info("Fused ResNet50 + U-Net prediction completed")
+            return (self._condition_from_prediction(condition_prediction.numpy()),
+                    self._depth_from_prediction(depth_prediction.numpy()))
+        except Exception as e:
+            logger.error(f"Error in _predict_fused: {e}")
+            raise
+
+    @staticmethod
+    def _condition_from_prediction(prediction):
+        logger.info("Raw Prediction Output: %s", prediction)  # Debug log
+
+        # Get the predicted class index
+        predicted_class_index = np.argmax(prediction, axis=1)[0]
+        logger.info("Predicted Class Index: %s", predicted_class_index)  # Debug log
+
+        # Map the predicted class index to the corresponding label
+        condition = _CONDITION_LABELS[predicted_class_index]
+        logger.info(f"Tire Condition Prediction: {condition}")  # Debug log
+
+        return condition
+
+    @staticmethod
+    def _conditions_from_prediction(prediction):
+        return [_CONDITION_LABELS[index] for index in np.argmax(prediction, axis=1)]
+
+    @staticmethod
+    def _depth_from_prediction(prediction):
+        # Depth at each threshold plus per-band tread statistics, straight from the float output
+        depth_metrics = tread_depth_metrics(prediction[:1])[0]
+        logger.info(f"Predicted Depth: {depth_metrics['predicted_tire_depth_mm']}")
 
-            # Convert the image to RGB (ResNet expects 3 channels)
-            image = image.convert('RGB')
+        return depth_metrics
 
-            # Convert the image to a numpy array and normalize it
-            image_array = np.array(image)
-            image_array = preprocess_input(image_array)  # Normalize using ResNet50 preprocessing
+    @staticmethod
+    def _preprocess_image_for_resnet(image):
+        try:
+            # Resize the decoded RGB image to the expected input size of the model (224x224)
+            image_array = np.array(image.resized((224, 224), 'RGB'))
+            # ResNet50 preprocessing without importing TensorFlow (unused when served by ONNX Runtime)
+            image_array = image_array[..., ::-1].astype(np.float32) - _RESNET_MEAN_BGR
 
             # Add batch dimension
             image_array = np.expand_dims(image_array, axis=0)
@@ -127,15 +295,11 @@ class TireSegmentationService:
     @staticmethod
     def _preprocess_image_for_unet(image):
         try:
-            # Resize the image to the expected input size of the model (256x256)
-            target_size = (256, 256)
-            image = image.resize(target_size)
-
-            # Convert the image to grayscale
-            image = image.convert('L')  # 'L' mode converts the image to grayscale
+            # Resize the image to the expected input size of the model (256x256) as grayscale
+            image = image.to_array((256, 256), 'L')
 
             # Normalize the image and add batch dimension
-            image = np.array(image) / 255.0  # Normalize to [0, 1]
+            image = image / 255.0  # Normalize to [0, 1]
             image = np.expand_dims(image, axis=-1)  # Add channel dimension (shape becomes [256, 256, 1])
             image = np.expand_dims(image, axis=0)  # Add batch dimension (shape becomes [1, 256, 256, 1])
 
@@ -143,21 +307,3 @@ class TireSegmentationService:
         except Exception as e:
             logger.error(f"Error in _preprocess_image_for_unet: {e}")
             raise
-
-    @staticmethod
-    def _calculate_predicted_depth(mask):
-        try:
-            # Calculate the predicted depth based on the mask (normalized pixel count)
-            predicted_depth = np.sum(mask) / (256 * 256)  # Normalized pixel count (0 to 1)
-
-            # Define real-world depth range (in mm)
-            min_depth_mm = 1.59  # Unsafe tread depth in mm (2/32")
-            max_depth_mm = 8.73  # New tire tread depth in mm (11/32")
-
-            # Convert predicted depth to real-world depth (in mm)
-            real_depth_mm = min_depth_mm + (predicted_depth * (max_depth_mm - min_depth_mm))
-
-            return real_depth_mm
-        except Exception as e:
-            logger.error(f"Error in _calculate_predicted_depth: {e}")
-            raise
\ No newline at end of file
@@ -1,13 +1,50 @@
 import os
-import joblib
+from functools import lru_cache
+
 import numpy as np
-import tensorflow as tf
-from PIL import Image
-import pandas as pd
+
+from Config import Config
+from services.image_pipeline import ensure_decoded
+from services.inference import runner
+from services.model_registry import load_keras_model, registry
+from services.onnx_backend import backend_loader
 
 _MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'toyota_price_model.joblib')
-_PRICE_MODEL = joblib.load(_MODEL_PATH)
-print("Toyota price predictor model loaded")
+_MOBILENET_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'mobilenetv2_toyota.keras')
+
+
+def _load_price_model():
+    import joblib
+    return joblib.load(_MODEL_PATH)
+
+
+# Toyota price predictor and MobileNetV2 classifier, loaded on first use
+registry.register('toyota_price', _load_price_model)
+_mobilenet = runner('mobilenetv2_vehicle', (224, 224, 3))
+registry.register(
+    'mobilenetv2_vehicle', backend_loader('mobilenetv2_vehicle', lambda: load_keras_model(_MOBILENET_PATH)),
+    warmup=_mobilenet.warmup,
+)
+
+# Input columns of the price pipeline, in order
+_PRICE_COLUMNS = ('Brand', 'Year', 'Mileage', 'Num_Owners', 'Color', 'Fuel_Type')
+
+
+def _price_frame(rows):
+    # Built column by column from the row tuples; far cheaper than a list of dicts
+    import pandas as pd
+    columns = list(zip(*rows)) if rows else [()] * len(_PRICE_COLUMNS)
+    return pd.DataFrame({name: list(values) for name, values in zip(_PRICE_COLUMNS, columns)})
+
+
+def _predict_rows(rows):
+    return registry.get('toyota_price').predict(_price_frame(rows))
+
+
+@lru_cache(maxsize=Config.PRICE_MEMO_SIZE)
+def _cached_price(row):
+    return _predict_rows([row])[0]
+
 
 class VehicleClassificationService:
     BRAND_MAP = {
@@ -17,15 +54,14 @@ class VehicleClassificationService:
         "Toyota_Highlander": "Highlander"
     }
 
-    def __init__(self):
-        model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'mobilenetv2_toyota.keras')
-        self.model_mobilenetv2 = tf.keras.models.load_model(model_path)
-        print("MobileNetV2 model loaded successfully")
+    @property
+    def model_mobilenetv2(self):
+        return registry.get('mobilenetv2_vehicle')
 
-    def classify_vehicle(self, image_path):
-        image = Image.open(image_path)
+    def classify_vehicle(self, image):
+        image = ensure_decoded(image, draft_size=224)
         processed_image = self._preprocess_image_for_mobilenetv2(image)
-        prediction = self.model_mobilenetv2.predict(processed_image)
+        prediction = _mobilenet(processed_image)
         vehicle_class = np.argmax(prediction, axis=1)[0]
         vehicle_classes = ["Toyota_Tundra", "Toyota_Tacoma", "Toyota_Prius", "Toyota_Highlander"]
         vehicle_type = vehicle_classes[vehicle_class]
@@ -34,30 +70,48 @@ class VehicleClassificationService:
 
     @staticmethod
     def _preprocess_image_for_mobilenetv2(image):
-        target_size = (224, 224)
-        image = image.resize(target_size)
-        image = np.array(image) / 255.0
+        image = image.to_array((224, 224)) / 255.0
         image = np.expand_dims(image, axis=0)
         return image
 
+    @classmethod
+    def _price_row(cls, features):
+        # One tuple in _PRICE_COLUMNS order
+        return (
+            cls.BRAND_MAP.get(features.get('car_type'), "Unknown"),
+            features.get('year', 0),
+            features.get('mileage', ''),
+            features.get('owners', 0),
+            features.get('color', ''),
+            features.get('fuel_type', ''),
+        )
+
     @classmethod
     def predict_price(cls, features: dict):
         try:
-            brand = cls.BRAND_MAP.get(features.get('car_type'), "Unknown")
-
-            input_data = {
-                'Brand': brand,
-                'Year': features.get('year', 0),
-                'Mileage': features.get('mileage', ''),
-                'Num_Owners': features.get('owners', 0),
-                'Color': features.get('color', ''),
-                'Fuel_Type': features.get('fuel_type', '')
-            }
-
-            input_df = pd.DataFrame([input_data])
-            prediction = _PRICE_MODEL.predict(input_df)
-            return prediction[0]
+            row = cls._price_row(features)
+            try:
+                hash(row)
+            except TypeError:
+                # Unhashable feature values (e.g. a list) skip the memo
+                return _predict_rows([row])[0]
+            # Identical listings are priced once (LRU memo over the feature tuple)
+            return _cached_price(row)
 
         except Exception as e:
             print(f"Prediction error: {e}")
             return None
+
+    @classmethod
+    def predict_prices(cls, features_list):
+        """
+        Prices many listings with a single vectorized `predict` call and
+        returns one price per listing, or None for every listing if the
+        prediction fails.
+        """
+        try:
+            prices = _predict_rows([cls._price_row(features) for features in features_list])
+            return [float(price) for price in prices]
+        except Exception as e:
+            print(f"Batch prediction error: {e}")
+            return None
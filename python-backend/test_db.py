@@ -1,19 +1,14 @@
-import sqlite3
+import data_access
 
 
 def test_vehicle_market_analysis(vehicle_type, model_year):
-    conn = sqlite3.connect('stores.db')  # Adjust path if needed
-    cursor = conn.cursor()
-
     query = """
     SELECT year_2020, year_2021, year_2022, year_2023, year_2024 
     FROM vehicle_market_analysis 
     WHERE vehicle_type = ? AND model_year = ?
     """
 
-    cursor.execute(query, (vehicle_type, model_year))
-    row = cursor.fetchone()
-    conn.close()
+    row = data_access.query_one(query, (vehicle_type, model_year))
 
     if row:
         print(f"Prices for {model_year} model_year {vehicle_type} from 2020 to 2024:")